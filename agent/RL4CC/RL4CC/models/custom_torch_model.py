@@ -37,6 +37,7 @@ class CustomTorchModel(BaseTorchModel):
     ):
     super().__init__(obs_space, action_space, num_outputs, model_config, name)
     self._last_q_values = None
+    self._traced_network = None
     # fetch the custom model config
     config = self.model_config.get("custom_model_config", {})
     # define input and output shapes
@@ -93,9 +94,28 @@ class CustomTorchModel(BaseTorchModel):
 
     return: logits, state
     """
+    # RLlib provides the preprocessed (flattened) observations as obs_flat:
+    # use them directly when they already match the network input
+    obs = input_dict["obs_flat"] if "obs_flat" in input_dict else None
+    if not (
+        isinstance(obs, torch.Tensor) and
+        obs.dtype == torch.float32 and
+        obs.shape[-1] == self.n_input
+      ):
+      obs = self.flatten_obs(input_dict["obs"])
 
-    obs = input_dict["obs"]
-    
+    q_values = self.network(obs)
+    self._last_q_values = q_values
+    return q_values, state
+
+  @staticmethod
+  def flatten_obs(obs) -> torch.Tensor:
+    """
+    Convert the observation (a torch.Tensor or an OrderedDict of tensors)
+    to a float tensor with the features along the last dimension
+
+    return: flattened observation
+    """
     if isinstance(obs, torch.Tensor):
         obs = obs.float()
     elif isinstance(obs, collections.OrderedDict):
@@ -109,10 +129,55 @@ class CustomTorchModel(BaseTorchModel):
         obs = torch.cat(tensors, dim=-1)
     else:
         raise TypeError(f"Expected input_dict['obs'] to be a torch.Tensor or OrderedDict but got {type(obs)}")
+    return obs
 
-    q_values = self.network(obs)
-    self._last_q_values = q_values
-    return q_values, state
+  def forward_inference(self, obs: torch.Tensor) -> torch.Tensor:
+    """
+    Inference fast path: obs must be a preflattened, contiguous float32
+    tensor of shape (batch_size, n_input). No type dispatch is performed and
+    autograd is disabled; the TorchScript-traced network is used if
+    available (see trace_inference)
+
+    return: model output
+    """
+    with torch.inference_mode():
+      if self._traced_network is not None:
+        return self._traced_network(obs)
+      return self.network(obs)
+
+  def trace_inference(self, example_obs: torch.Tensor = None):
+    """
+    Trace the network (in evaluation mode) with TorchScript for the
+    inference fast path. The trace does not follow later changes of the
+    weights: drop it through reset_inference (and trace again) whenever they
+    are replaced
+
+    return: traced network
+    """
+    if example_obs is None:
+      example_obs = torch.zeros((1, self.n_input), dtype=torch.float32)
+    was_training = self.network.training
+    self.network.eval()
+    with torch.no_grad():
+      traced_network = torch.jit.trace(self.network, example_obs)
+    self.network.train(was_training)
+    # not registered as a submodule, so that the state_dict is unchanged
+    object.__setattr__(self, "_traced_network", traced_network)
+    return self._traced_network
+
+  def reset_inference(self):
+    """
+    Drop the TorchScript-traced network
+    """
+    object.__setattr__(self, "_traced_network", None)
+
+  @staticmethod
+  def set_inference_threads(n_threads: int = 1):
+    """
+    Pin the number of intra-op threads (a single thread minimizes the
+    latency of single-sample inference on small networks)
+    """
+    torch.set_num_threads(n_threads)
 
   def value_function(self):
     """
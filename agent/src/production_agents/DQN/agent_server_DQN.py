@@ -5,7 +5,8 @@ import flask
 import numpy as np
 from flask import request
 from ray.rllib.models import ModelCatalog
-from production_agent_DQN import ProductionAgentDQN
+from policy_registry import PolicyRegistry, load_policies_config
+from observation import observation_for_agent, stack_observations
 from RL4CC.models.custom_torch_model import CustomTorchModel
 from ray.rllib.policy.sample_batch import SampleBatch, MultiAgentBatch
 
@@ -21,16 +22,55 @@ app = flask.Flask(__name__)
 
 checkpoint_path = "/app/trained_checkpoint"
 parameters_path = "/app/agents_parameters.json"
+policies_path = os.getenv("POLICIES_PATH", "/app/policies.json")
 
 with open(parameters_path, 'r') as file:
     parameters = json.load(file)
 
-if "rllib_checkpoint.json" in os.listdir(checkpoint_path):
+if os.path.isdir(checkpoint_path) and "rllib_checkpoint.json" in os.listdir(checkpoint_path):
     with open(os.path.join(checkpoint_path, "rllib_checkpoint.json"), 'r') as file:
         content = json.load(file)
         
-agent = ProductionAgentDQN()
-agent.reload_from_checkpoint(checkpoint_path)
+# Every policy listed in policies.json is hosted by this process; requests
+# select one through the optional "policy" key (the default one otherwise)
+cache_parameters = parameters.get("DecisionCache", {})
+decision_cache = None
+if cache_parameters.get("Enabled", 0):
+    decision_cache = {
+        "quantization_step": float(cache_parameters.get("QuantizationStep", 0.01)),
+        "max_size": int(cache_parameters.get("MaxSize", 4096)),
+    }
+inference_parameters = parameters.get("FastInference", {})
+fast_inference = None
+if inference_parameters.get("Enabled", 0):
+    fast_inference = {
+        "n_threads": int(inference_parameters.get("Threads", 1)),
+        "torchscript": bool(inference_parameters.get("TorchScript", 0)),
+    }
+registry = PolicyRegistry(
+    max_workers=int(os.getenv("POLICY_WORKERS", 4)),
+    decision_cache=decision_cache,
+    fast_inference=fast_inference
+)
+registry.load(load_policies_config(policies_path, checkpoint_path))
+
+def policy_error(e):
+    return json.dumps({"error": str(e)}), 404
+
+def observation_error(e):
+    print(f"Rejected observation: {e}")
+    return json.dumps({"error": str(e)}), 400
+
+def resolve_policy(data):
+    """The registry entry selected by the request (a KeyError if unknown)"""
+    return registry.get(data.get("policy"))
+
+@app.route('/policies', methods=['GET'])
+def policies():
+    return json.dumps({
+        "default": registry.default_policy,
+        "policies": {name: entry.checkpoint_path for name, entry in registry.policies.items()}
+    })
 
 @app.route('/action', methods=['POST'])
 def action():
@@ -43,37 +83,38 @@ def action():
     
     print("Received observation:", obs)
 
-    # Prepare the observation in a format suited for the Agent
-    obs_for_agent = {
-        "n_instances": np.array([obs['n_instances']]),
-        "pressure": np.array([obs['pressure']]),
-        "queue_length_dominant": np.array([obs['queue_length_dominant']]),
-        "utilization": np.array([obs['utilization']]),
-        "workload": np.array([obs['workload']])
-    }
+    # Prepare the observation in a format suited for the Agent; keys the
+    # policy does not read are rejected instead of being silently dropped
+    try:
+        obs_for_agent = observation_for_agent(obs)
+    except ValueError as e:
+        return observation_error(e)
 
-    action = agent.take_action(obs_for_agent)
+    try:
+        entry = resolve_policy(data)
+    except KeyError as e:
+        return policy_error(e)
+    action = registry.run(entry.name, lambda agent: agent.take_action(obs_for_agent))
 
     #it is necessary to add 1because of a stupid bug inside the Discrete space of RLlib, which starts from 0 instead of 1
     #even if you specifically tell it to --> https://github.com/ray-project/ray/issues/42196
     return json.dumps({"action": int(action)+1}) 
 
-def stack_features(data, keys):
-    """Returns np.array of shape (batch_size, num_features)"""
-    return np.stack([
-        np.array([obs[k] for obs in data]) for k in keys
-    ], axis=1)
-
 @app.route('/learn', methods=['POST'])
 def learn():
     print("Received a request for learning.")
     data = json.loads(request.get_data().decode("utf-8"))
-
-    obs_keys = ["n_instances", "pressure", "queue_length_dominant", "utilization", "workload"]
+    try:
+        entry = resolve_policy(data)
+    except KeyError as e:
+        return policy_error(e)
 
     # Stack each observation set into (batch_size, num_features)
-    observations = stack_features(data["observations"], obs_keys)
-    next_observations = stack_features(data["next_observations"], obs_keys)
+    try:
+        observations = stack_observations(data["observations"])
+        next_observations = stack_observations(data["next_observations"])
+    except ValueError as e:
+        return observation_error(e)
 
     sample_batch = SampleBatch({
         SampleBatch.OBS: observations,
@@ -95,7 +136,7 @@ def learn():
         env_steps=sample_batch.count,
     )
 
-    response = agent.training_step(wrapped_batch)
+    response = registry.run(entry.name, lambda agent: agent.training_step(wrapped_batch))
     print(f"Training step response: {response}")
 
     return json.dumps({"message": "Policy updated with new experiences."})
@@ -109,7 +150,14 @@ def set_epsilon():
         start = float(data.get("start", 0))
         end = float(data.get("end", 0))
         schedule_timesteps = int(data.get("schedule_timesteps", 0))
-        agent.set_epsilon(start=start, end=end, schedule_timesteps=schedule_timesteps)
+        try:
+            entry = resolve_policy(data)
+        except KeyError as e:
+            return policy_error(e)
+        registry.run(
+            entry.name,
+            lambda agent: agent.set_epsilon(start=start, end=end, schedule_timesteps=schedule_timesteps)
+        )
         return json.dumps({"message": f"Epsilon set to {start}, decaying to {end} over {schedule_timesteps} timesteps."}), 200
     except Exception as e:
         return json.dumps({"error": str(e)}), 400
@@ -120,11 +168,36 @@ def save_checkpoint():
         print("Received a request to save the checkpoint.")
         data = json.loads(request.get_data().decode("utf-8"))
         timestep = data.get("timestep", "no_timestep")
-        checkpoint_path = agent.save_checkpoint(f"/app/trained_checkpoint/temp_checkpoint_{timestep}")
-        return json.dumps({"message": f"Checkpoint saved to {checkpoint_path}"}), 200
+        try:
+            entry = resolve_policy(data)
+        except KeyError as e:
+            return policy_error(e)
+        saved_path = registry.run(
+            entry.name,
+            lambda agent: agent.save_checkpoint(os.path.join(entry.checkpoint_path, f"temp_checkpoint_{timestep}"))
+        )
+        return json.dumps({"message": f"Checkpoint saved to {saved_path}"}), 200
+    except Exception as e:
+        return json.dumps({"error": str(e)}), 500
+
+
+@app.route('/reload', methods=['POST'])
+def reload():
+    try:
+        print("Received a request to reload the policy.")
+        data = json.loads(request.get_data().decode("utf-8") or "{}")
+        try:
+            entry = resolve_policy(data)
+        except KeyError as e:
+            return policy_error(e)
+        entry = registry.reload(entry.name, data.get("checkpoint_path"))
+        return json.dumps({"message": f"Policy '{entry.name}' reloaded from {entry.checkpoint_path}"}), 200
     except Exception as e:
         return json.dumps({"error": str(e)}), 500
 
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return json.dumps(registry.cache_stats())
 
 @app.route('/shutdown', methods=['POST'])
 def shutdown():
@@ -0,0 +1,66 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+
+
+class DecisionCache:
+    """
+    LRU cache of greedy decisions keyed by the quantized observation.
+
+    Observations are normalized in [0, 1], so two observations falling in the
+    same `quantization_step` cell share the cached action. The cache must be
+    invalidated whenever the policy weights change.
+    """
+    def __init__(self, quantization_step: float = 0.01, max_size: int = 4096):
+        if quantization_step <= 0:
+            raise ValueError("quantization_step must be positive")
+        self.quantization_step = quantization_step
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def key(self, obs: dict) -> tuple:
+        return tuple(
+            (name, tuple(np.rint(np.asarray(obs[name], dtype=np.float64).reshape(-1) / self.quantization_step).astype(np.int64)))
+            for name in sorted(obs)
+        )
+
+    def get(self, obs: dict):
+        """Return the cached action for `obs`, None on a miss."""
+        key = self.key(obs)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, obs: dict, action):
+        key = self.key(obs)
+        with self.lock:
+            self.entries[key] = action
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "quantization_step": self.quantization_step,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
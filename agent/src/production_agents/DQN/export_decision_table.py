@@ -0,0 +1,91 @@
+"""
+Distill a trained DQN policy into a precomputed decision table.
+
+The greedy action is evaluated on a regular grid over the (normalized)
+observation space and saved, together with the grid axes, in a compressed
+`.npz` file that the log agent can query without Torch or Ray:
+
+    python3 export_decision_table.py --checkpoint /app/trained_checkpoint \
+        --output /app/outputs/decision_table.npz --points 11 --points-per-key n_instances=6
+"""
+import os
+import ray
+import argparse
+import itertools
+import numpy as np
+from ray.rllib.models import ModelCatalog
+from production_agent_DQN import ProductionAgentDQN
+from RL4CC.models.custom_torch_model import CustomTorchModel
+from observation import OBS_KEYS
+
+# see agent_server_DQN.action: RLlib Discrete actions start from 0
+ACTION_OFFSET = 1
+
+
+def build_axes(points: int, points_per_key: dict) -> list:
+    return [
+        np.linspace(0.0, 1.0, int(points_per_key.get(key, points)), dtype=np.float32)
+        for key in OBS_KEYS
+    ]
+
+
+def evaluate_grid(agent: ProductionAgentDQN, axes: list, batch_size: int) -> np.ndarray:
+    """Greedy action (with ACTION_OFFSET) for every point of the grid."""
+    policy = agent.policy
+    shape = tuple(len(axis) for axis in axes)
+    actions = np.empty(int(np.prod(shape)), dtype=np.int8)
+    grid_points = itertools.product(*axes)
+    start = 0
+    while start < actions.size:
+        obs_batch = np.array(list(itertools.islice(grid_points, batch_size)), dtype=np.float32)
+        batch_actions = policy.compute_actions(obs_batch, explore=False)[0]
+        actions[start:start + len(obs_batch)] = np.asarray(batch_actions) + ACTION_OFFSET
+        start += len(obs_batch)
+        print(f"Evaluated {start}/{actions.size} grid points", flush=True)
+    return actions.reshape(shape)
+
+
+def save_decision_table(path: str, actions: np.ndarray, axes: list):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez_compressed(
+        path,
+        actions=actions.astype(np.int8),
+        keys=np.array(OBS_KEYS),
+        **{f"axis_{idx}": axis for idx, axis in enumerate(axes)}
+    )
+
+
+def parse_points_per_key(values: list) -> dict:
+    points_per_key = {}
+    for value in values or []:
+        key, points = value.split("=")
+        if key not in OBS_KEYS:
+            raise ValueError(f"Unknown observation key '{key}', expected one of {OBS_KEYS}")
+        points_per_key[key] = int(points)
+    return points_per_key
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export a trained DQN policy as a decision table')
+    parser.add_argument('--checkpoint', type=str, default="/app/trained_checkpoint",
+                        help='Checkpoint directory (algo_state.pkl and policy_model_weights.pt)')
+    parser.add_argument('--output', type=str, default="decision_table.npz",
+                        help='Path of the .npz decision table')
+    parser.add_argument('--points', type=int, default=11,
+                        help='Grid points per observation key in [0, 1]')
+    parser.add_argument('--points-per-key', type=str, nargs='*',
+                        help='Per-key overrides, e.g., n_instances=6 workload=21')
+    parser.add_argument('--batch-size', type=int, default=4096,
+                        help='Grid points evaluated per forward pass')
+    args = parser.parse_args()
+
+    ray.init(address=os.getenv("RAY_ADDRESS", "ray://localhost:10001"), ignore_reinit_error=True)
+    ModelCatalog.register_custom_model("custom_torch_model", CustomTorchModel)
+
+    agent = ProductionAgentDQN()
+    agent.reload_from_checkpoint(args.checkpoint)
+
+    axes = build_axes(args.points, parse_points_per_key(args.points_per_key))
+    actions = evaluate_grid(agent, axes, args.batch_size)
+    save_decision_table(args.output, actions, axes)
+    print(f"Decision table with shape {actions.shape} saved to {args.output}")
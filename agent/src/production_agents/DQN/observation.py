@@ -0,0 +1,27 @@
+import numpy as np
+
+# Keys of the observation the policies are trained on (see
+# src/custom_environment.py), sorted as in the flattened Dict observation space
+OBS_KEYS = ["n_instances", "pressure", "queue_length_dominant", "utilization", "workload"]
+
+
+def check_observation_keys(obs: dict):
+    """Raise ValueError if the observation misses keys the policy reads (other keys are ignored)"""
+    missing = [key for key in OBS_KEYS if key not in obs]
+    if missing:
+        raise ValueError(f"Observation keys {missing} of the policy observation {OBS_KEYS} are missing")
+
+
+def observation_for_agent(obs: dict) -> dict:
+    """The observation as the policy takes it, one array per key"""
+    check_observation_keys(obs)
+    return {key: np.array([obs[key]]) for key in OBS_KEYS}
+
+
+def stack_observations(observations: list) -> np.ndarray:
+    """Observations as an array of shape (batch_size, num_features)"""
+    for obs in observations:
+        check_observation_keys(obs)
+    return np.stack([
+        np.array([obs[key] for obs in observations]) for key in OBS_KEYS
+    ], axis=1)
@@ -0,0 +1,119 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from production_agent_DQN import ProductionAgentDQN
+
+DEFAULT_POLICY = "default"
+
+
+class PolicyEntry:
+    def __init__(self, name: str, checkpoint_path: str, decision_cache: dict = None, fast_inference: dict = None):
+        self.name = name
+        self.checkpoint_path = checkpoint_path
+        self.agent = ProductionAgentDQN()
+        if decision_cache is not None:
+            self.agent.enable_decision_cache(**decision_cache)
+        if fast_inference is not None:
+            self.agent.enable_fast_inference(**fast_inference)
+        # serializes action/learn/epsilon updates on the same policy, while
+        # different policies can be served and trained concurrently
+        self.lock = threading.Lock()
+
+    def load(self, checkpoint_path: str = None):
+        with self.lock:
+            if checkpoint_path is not None:
+                self.checkpoint_path = checkpoint_path
+            self.agent.reload_from_checkpoint(self.checkpoint_path)
+        return self
+
+
+class PolicyRegistry:
+    """
+    Hosts several named DQN policies in a single agent server process.
+
+    All the policies share the Ray connection, the Torch runtime and a single
+    thread pool, while each one keeps its own online replay buffer (learning
+    queue) and epsilon schedule. If `decision_cache` is given (keyword
+    arguments of `DecisionCache`), each policy caches its greedy decisions;
+    if `fast_inference` is given (keyword arguments of
+    `ProductionAgentDQN.enable_fast_inference`), greedy actions are computed
+    through the inference fast path of the model.
+    """
+    def __init__(self, max_workers: int = 4, decision_cache: dict = None, fast_inference: dict = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="policy")
+        self.decision_cache = decision_cache
+        self.fast_inference = fast_inference
+        self.policies = {}
+        self.default_policy = None
+
+    def load(self, policies: dict):
+        """
+        Load the given policies, one after the other, since building an RLlib
+        Algorithm is not thread-safe.
+        Args:
+            policies (dict): Mapping from policy name to checkpoint directory.
+        Raises:
+            RuntimeError: If some policies cannot be loaded, after trying all of them.
+        """
+        failures = {}
+        for name, path in policies.items():
+            try:
+                entry = PolicyEntry(name, path, self.decision_cache, self.fast_inference).load()
+            except Exception as e:
+                print(f"Error loading policy '{name}' from {path}: {e}", flush=True)
+                failures[name] = e
+                continue
+            self.policies[entry.name] = entry
+            print(f"Policy '{entry.name}' loaded from {entry.checkpoint_path}", flush=True)
+        if failures:
+            raise RuntimeError(
+                "Failed to load the policies " + ", ".join(f"'{name}' ({e})" for name, e in failures.items())
+            ) from next(iter(failures.values()))
+        if self.default_policy is None and self.policies:
+            self.default_policy = DEFAULT_POLICY if DEFAULT_POLICY in self.policies else next(iter(self.policies))
+
+    def reload(self, name: str = None, checkpoint_path: str = None) -> PolicyEntry:
+        """Hot-reload a policy, from a new checkpoint directory if given."""
+        entry = self.get(name)
+        return self.executor.submit(entry.load, checkpoint_path).result()
+
+    def cache_stats(self) -> dict:
+        return {
+            name: entry.agent.decision_cache.stats() if entry.agent.decision_cache is not None else None
+            for name, entry in self.policies.items()
+        }
+
+    def get(self, name: str = None) -> PolicyEntry:
+        """Return the policy registered as `name` (the default one if None)."""
+        if name is None:
+            name = self.default_policy
+        if name not in self.policies:
+            raise KeyError(f"Unknown policy '{name}'. Available policies: {self.names()}")
+        return self.policies[name]
+
+    def names(self) -> list:
+        return list(self.policies.keys())
+
+    def run(self, name: str, fn, *args, **kwargs):
+        """Run `fn(agent, ...)` on the shared thread pool, holding the policy lock."""
+        entry = self.get(name)
+
+        def _call():
+            with entry.lock:
+                return fn(entry.agent, *args, **kwargs)
+
+        return self.executor.submit(_call).result()
+
+
+def load_policies_config(policies_path: str, checkpoint_path: str) -> dict:
+    """
+    Read the policies to host from `policies_path`, a JSON file mapping each
+    policy name (e.g., the application it scales) to its checkpoint directory.
+    If the file does not exist, a single default policy is loaded from
+    `checkpoint_path`.
+    """
+    if os.path.exists(policies_path):
+        with open(policies_path, 'r') as file:
+            return json.load(file)
+    return {DEFAULT_POLICY: checkpoint_path}
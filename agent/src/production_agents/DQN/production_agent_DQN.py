@@ -4,6 +4,8 @@ import random
 import cloudpickle
 import numpy as np
 from ray.tune.registry import register_env
+from decision_cache import DecisionCache
+from RL4CC.models.custom_torch_model import CustomTorchModel
 from src.custom_environment import CustomEnvironment
 register_env("CustomEnvironment", lambda config: CustomEnvironment(config))
 # from src.production_agents.DQN.scaling_env import ScalingEnv 
@@ -29,6 +31,39 @@ class ProductionAgentDQN:
         self.current_timestep = 0
         self.epsilon_scheduler = LinearEpsilonScheduler()
         self.online_replay_buffer = []
+        self.decision_cache = None
+        self.fast_inference = False
+        self.torchscript = False
+
+    def enable_fast_inference(self, n_threads: int = 1, torchscript: bool = False):
+        """
+        Compute greedy actions directly with the inference fast path of the
+        policy model, bypassing the RLlib action computation.
+        Args:
+            n_threads (int): Number of Torch intra-op threads.
+            torchscript (bool): Whether to run the TorchScript-traced network.
+        """
+        self.fast_inference = True
+        self.torchscript = torchscript
+        CustomTorchModel.set_inference_threads(n_threads)
+
+    def enable_decision_cache(self, quantization_step: float = 0.01, max_size: int = 4096):
+        """
+        Cache greedy decisions keyed by the quantized observation.
+        Args:
+            quantization_step (float): Width of the quantization cells of the (normalized) observation.
+            max_size (int): Maximum number of cached decisions (LRU eviction).
+        """
+        self.decision_cache = DecisionCache(quantization_step=quantization_step, max_size=max_size)
+
+    def _on_weights_changed(self):
+        """Drop everything derived from the previous weights."""
+        if self.decision_cache is not None:
+            self.decision_cache.invalidate()
+        if self.fast_inference:
+            self.policy.model.reset_inference()
+            if self.torchscript:
+                self.policy.model.trace_inference()
         
     def reload_from_checkpoint(self, checkpoint_path: str):
         """
@@ -60,6 +95,7 @@ class ProductionAgentDQN:
         policy = self.algo.get_policy()
         policy.model.load_state_dict(torch.load(model_path))
 
+        self._on_weights_changed()
         print("Algorithm state and policy weights loaded successfully.", flush=True)
 
         batch_size = self.algo.config["train_batch_size"]
@@ -118,11 +154,32 @@ class ProductionAgentDQN:
             action = action_space.sample()
         else:
             # exploit
-            action = self.algo.compute_single_action(obs, explore=False)
+            action = self.decision_cache.get(obs) if self.decision_cache is not None else None
+            if action is None:
+                if self.fast_inference:
+                    action = self._greedy_action(obs)
+                else:
+                    action = self.algo.compute_single_action(obs, explore=False)
+                if self.decision_cache is not None:
+                    self.decision_cache.put(obs, action)
         
         self.current_timestep += 1
         return action
     
+    def _greedy_action(self, obs: dict):
+        """Greedy action through the inference fast path of the policy model."""
+        model = self.policy.model
+        # flatten as the Dict observation space does (sorted keys)
+        flat_obs = np.concatenate([np.asarray(obs[key], dtype=np.float32).reshape(-1) for key in sorted(obs)])
+        obs_tensor = torch.from_numpy(flat_obs).reshape(1, -1)
+        with torch.inference_mode():
+            model_out = model.forward_inference(obs_tensor)
+            # DQN heads: the greedy action maximizes the advantages (the
+            # dueling state value and centering do not change the argmax)
+            if hasattr(model, "get_q_value_distributions"):
+                model_out = model.get_q_value_distributions(model_out)[0]
+        return int(torch.argmax(model_out, dim=1)[0])
+
     def _get_concatenated_batch(self, sample_size):
         accumulated_samples = None
         total_samples = 0
@@ -182,6 +239,9 @@ class ProductionAgentDQN:
         except Exception as e:
             print(f"Error during training step: {e}")
             return {"trained": False, "error": str(e)}
+        finally:
+            # the weights (may) have changed, cached decisions are stale
+            self._on_weights_changed()
 
             
     def save_checkpoint(self, path: str):
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import deque
+
+from prometheus_client import Counter, Gauge, Histogram
+
+ACTUATION_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 300, 600)
+ACTUATION_SECONDS = Histogram(
+    "gateway_actuation_seconds",
+    "Time from a change of the desired replicas to the deployment reaching them "
+    "(up: available replicas, down: pods not terminated)",
+    ["deployment", "direction"], buckets=ACTUATION_BUCKETS
+)
+SUPERSEDED_ACTUATIONS = Counter(
+    "gateway_actuations_superseded_total",
+    "Changes of the desired replicas replaced by another one before being reached",
+    ["deployment", "direction"]
+)
+PENDING_REPLICAS = Gauge(
+    "gateway_pending_replicas", "Desired replicas not available yet (negative while draining)", ["deployment"]
+)
+
+
+def pending_replicas(status):
+    """
+    Replicas still to be reached by a deployment: positive while desired
+    replicas are not available, negative while removed replicas are draining
+    """
+    if status["available"] < status["instances"]:
+        return status["instances"] - status["available"]
+    return min(status["instances"] - status.get("current", status["instances"]), 0)
+
+
+class ActuationTracker:
+    """
+    Time taken by the deployments to reach their desired replicas.
+
+    An actuation starts when the desired replicas change: at the scale
+    command (`commanded`), or when a change made elsewhere is observed. It
+    completes when an observed status (`observe`) reaches the new replicas: a
+    scale-up when the available replicas reach them (time to ready), a
+    scale-down when the pods not terminated yet ("current", the terminating
+    ones included) drop to them (time to drain); a scale-down is not
+    completed by a status without "current". An
+    actuation replaced by another one before completing is counted as
+    superseded. The last `history` completed actuations of each deployment are
+    kept for `status`.
+    """
+    def __init__(self, history=10):
+        self.history = history
+        self.desired = {}
+        self.observed = {}
+        self.in_progress = {}
+        self.completed = {}
+        self.lock = threading.Lock()
+
+    def commanded(self, name, replicas, at=None):
+        """The deployment is being scaled to `replicas`, returns the actuation"""
+        with self.lock:
+            return self._start(name, replicas, at if at is not None else time.time())
+
+    def cancel(self, name, actuation):
+        """The scale command of `actuation` failed"""
+        with self.lock:
+            if actuation is not None and self.in_progress.get(name) is actuation:
+                del self.in_progress[name]
+                self.desired[name] = actuation["from"]
+
+    def observe(self, name, status, at=None):
+        """Status of the deployment, as served by /scale-status"""
+        at = at if at is not None else time.time()
+        with self.lock:
+            PENDING_REPLICAS.labels(deployment=name).set(pending_replicas(status))
+            self.desired.setdefault(name, status["instances"])
+            last_observed = self.observed.get(name)
+            self.observed[name] = status["instances"]
+            if last_observed is not None and status["instances"] != last_observed:
+                # the change of a scale command, or a scaling made elsewhere (e.g., kubectl scale)
+                self._start(name, status["instances"], at)
+
+            actuation = self.in_progress.get(name)
+            if actuation is None or actuation["to"] != status["instances"]:
+                return
+            if actuation["direction"] == "up":
+                reached = status["available"] >= actuation["to"]
+            else:
+                current = status.get("current")
+                reached = current is not None and current <= actuation["to"]
+            if reached:
+                del self.in_progress[name]
+                actuation["seconds"] = max(at - actuation["started_at"], 0)
+                ACTUATION_SECONDS.labels(deployment=name, direction=actuation["direction"]).observe(actuation["seconds"])
+                completed = self.completed.setdefault(name, deque(maxlen=self.history))
+                completed.append(actuation)
+
+    def status(self, name, at=None):
+        """Actuation in progress (with its elapsed time) and the last completed ones"""
+        at = at if at is not None else time.time()
+        with self.lock:
+            actuation = self.in_progress.get(name)
+            if actuation is not None:
+                actuation = {**actuation, "elapsed": at - actuation["started_at"]}
+            return {
+                "actuation": actuation,
+                "actuations": [dict(completed) for completed in self.completed.get(name, ())],
+            }
+
+    def _start(self, name, replicas, at):
+        """Start an actuation to `replicas` (lock held)"""
+        actuation = self.in_progress.get(name)
+        if actuation is not None:
+            if actuation["to"] == replicas:
+                # the command and its watch event
+                actuation["started_at"] = min(actuation["started_at"], at)
+                return actuation
+            SUPERSEDED_ACTUATIONS.labels(deployment=name, direction=actuation["direction"]).inc()
+        previous = self.desired.get(name)
+        self.desired[name] = replicas
+        if previous is None or previous == replicas:
+            self.in_progress.pop(name, None)
+            return None
+        actuation = self.in_progress[name] = {
+            "direction": "up" if replicas > previous else "down",
+            "from": previous,
+            "to": replicas,
+            "started_at": at,
+        }
+        return actuation
@@ -0,0 +1,123 @@
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+SHED_REQUESTS = Counter(
+    "gateway_shed_requests_total", "Requests rejected by the admission control of each downstream application",
+    ["downstream"]
+)
+ADMISSION_LIMIT = Gauge(
+    "gateway_admission_limit", "Requests admitted in flight to each downstream application", ["downstream"]
+)
+ADMISSION_WAIT = Histogram(
+    "gateway_admission_wait_seconds", "Time spent by the admitted requests waiting for a slot", ["downstream"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+
+class AdmissionRejected(Exception):
+    """The downstream application has no slot available within the admission wait"""
+    def __init__(self, downstream):
+        super().__init__(f"{downstream} is over its concurrency limit")
+        self.downstream = downstream
+
+
+class AdmissionController:
+    """
+    Concurrency limit of the requests in flight to each downstream
+    application, so that overload sheds requests instead of queueing them
+    behind the single worker of each replica until they time out.
+
+    The limit is given per replica and multiplied by the available replicas
+    of the deployment (`replicas_func(downstream)`):
+    - 'static': `limit_per_replica`;
+    - 'aimd': starts at `limit_per_replica` and adapts to the response time
+      of the application: each request completed within
+      `latency_targets[downstream]` adds 1 / limit to the limit per replica
+      (the limit being the limit per replica times the replicas), so that it
+      grows by about one for every limit of requests completed; it is
+      multiplied by `backoff` (at most once per latency target) when a request
+      is slower or fails, between `min_limit_per_replica` and
+      `max_limit_per_replica`;
+    - 'off': no limit.
+    A request beyond the limit waits up to `max_wait` seconds for a slot, and
+    is then rejected (AdmissionRejected) and counted as shed.
+    """
+    MODES = ('off', 'static', 'aimd')
+
+    def __init__(self, mode, replicas_func, limit_per_replica=2, max_wait=0.0, latency_targets=None,
+                 backoff=0.9, min_limit_per_replica=1, max_limit_per_replica=8):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown admission mode '{mode}', expected one of {self.MODES}")
+        self.mode = mode
+        self.replicas_func = replicas_func
+        self.limit_per_replica = limit_per_replica
+        self.max_wait = max_wait
+        self.latency_targets = latency_targets or {}
+        self.backoff = backoff
+        self.min_limit_per_replica = min_limit_per_replica
+        self.max_limit_per_replica = max_limit_per_replica
+        self.limits = {}
+        self.last_decrease = {}
+        self.in_flight = {}
+        self.shed = {}
+        self.condition = threading.Condition()
+
+    def limit(self, downstream):
+        """Requests admitted in flight to `downstream` (condition held)"""
+        per_replica = self.limits.setdefault(downstream, float(self.limit_per_replica))
+        limit = max(int(per_replica * max(self.replicas_func(downstream), 1)), 1)
+        ADMISSION_LIMIT.labels(downstream=downstream).set(limit)
+        return limit
+
+    def acquire(self, downstream):
+        """Take a slot for a request to `downstream`, raising AdmissionRejected if none frees up in time"""
+        if self.mode == 'off':
+            return
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        with self.condition:
+            while self.in_flight.get(downstream, 0) >= self.limit(downstream):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.shed[downstream] = self.shed.get(downstream, 0) + 1
+                    SHED_REQUESTS.labels(downstream=downstream).inc()
+                    raise AdmissionRejected(downstream)
+                self.condition.wait(remaining)
+            self.in_flight[downstream] = self.in_flight.get(downstream, 0) + 1
+        ADMISSION_WAIT.labels(downstream=downstream).observe(time.monotonic() - started)
+
+    def release(self, downstream, elapsed, success=True):
+        """Free the slot of a request to `downstream`, completed in `elapsed` seconds"""
+        if self.mode == 'off':
+            return
+        with self.condition:
+            self.in_flight[downstream] -= 1
+            if self.mode == 'aimd':
+                self._adapt(downstream, elapsed, success)
+            self.condition.notify_all()
+
+    def _adapt(self, downstream, elapsed, success):
+        """Additive increase, multiplicative decrease of the limit (condition held)"""
+        target = self.latency_targets.get(downstream)
+        per_replica = self.limits.setdefault(downstream, float(self.limit_per_replica))
+        now = time.monotonic()
+        if success and (target is None or elapsed <= target):
+            replicas = max(self.replicas_func(downstream), 1)
+            per_replica += 1 / (per_replica * replicas)
+        elif now - self.last_decrease.get(downstream, 0) >= (target or 0):
+            # one decrease per congestion episode, not per slow request
+            self.last_decrease[downstream] = now
+            per_replica *= self.backoff
+        self.limits[downstream] = min(max(per_replica, self.min_limit_per_replica), self.max_limit_per_replica)
+
+    def status(self, downstream):
+        """Limit, requests in flight and requests shed since the start of the gateway"""
+        with self.condition:
+            return {
+                "mode": self.mode,
+                "limit": self.limit(downstream) if self.mode != 'off' else None,
+                "in_flight": self.in_flight.get(downstream, 0),
+                "shed": self.shed.get(downstream, 0),
+            }
@@ -4,15 +4,21 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 os.environ['TF_TRT_DISABLE_CUDA_LOGGER'] = '1'
 
 from kubernetes import client, config
-from flask import Flask, jsonify, g, request
+from flask import Flask, Response, jsonify, g, request
 import numpy as np
 import logging
-import logging_loki
+from loki_batch_handler import create_loki_handler
+from payload import NPZ_CONTENT_TYPE, encode_arrays
+from warm_cache import WarmModel, load_image_dataset
+from micro_batching import create_micro_batcher
+from concurrency import configure_tf_threads
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten
 
 tf.get_logger().setLevel('ERROR')
+# TensorFlow threads from the CPU limit of the pod and the concurrency profile
+configure_tf_threads(tf)
 
 app = Flask(__name__)
 
@@ -24,13 +30,8 @@ apps_v1 = client.AppsV1Api()
 # Configure Loki logging
 LOKI_URL = os.environ.get("LOKI_URL", "http://loki:3100/loki/api/v1/push")
 
-logging_loki.emitter.LokiEmitter.level_tag = "level"
-loki_handler = logging_loki.LokiHandler(
-    url=LOKI_URL,
-    tags={"application": "flask-app-1"},
-    version="1",
-)
-loki_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+# Records are shipped to Loki in batches by a background thread, off the request path
+loki_handler = create_loki_handler(LOKI_URL, tags={"application": "flask-app-1"})
 
 logger = logging.getLogger("flask-app-1")
 logger.setLevel(logging.INFO)
@@ -53,6 +54,9 @@ def after_request(response):
     )
     return response
 
+# Deflate the binary payloads sent to app2
+PAYLOAD_COMPRESS = os.getenv("PAYLOAD_COMPRESS", "0") == "1"
+
 @app.route('/')
 def health():
     return 'App 1 is healthy!'
@@ -61,17 +65,25 @@ def health():
 def train_part1():
     result = train_model_part1()
 
+    # app2 declares (through the gateway) how many rows it uses
+    max_rows = request.headers.get('X-Max-Rows', type=int)
+    arrays = {name: values[:max_rows] for name, values in result.items()}
+
+    if NPZ_CONTENT_TYPE in request.headers.get('Accept', ''):
+        body = encode_arrays(arrays, compress=PAYLOAD_COMPRESS)
+        return Response(body, status=200, mimetype=NPZ_CONTENT_TYPE)
+
     response = {
         'part1_completed': True,
-        'train_features': result['train_features'].tolist(),
-        'train_labels': result['train_labels'].tolist(),
-        'test_features': result['test_features'].tolist(),
-        'test_labels': result['test_labels'].tolist()
+        'train_features': arrays['train_features'].tolist(),
+        'train_labels': arrays['train_labels'].tolist(),
+        'test_features': arrays['test_features'].tolist(),
+        'test_labels': arrays['test_labels'].tolist()
     }
 
     return jsonify(response), 200
 
-def train_model_part1():
+def build_model_part1():
     model_part1 = Sequential()
     model_part1.add(Conv2D(8, (3,3), 1, activation='relu', input_shape=(8,8,3)))
     model_part1.add(Conv2D(3, (3,3), 1, activation='relu'))
@@ -81,42 +93,70 @@ def train_model_part1():
     model_part1.compile(optimizer='adam', 
                        loss=tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True),
                        metrics=['accuracy'])
-
-    try:
-        # Update the training path to point to the locally copied Training directory
-        training_path = "./Training"
-        
-        if not os.path.exists(training_path):
-            error_msg = f"Training data not found at {training_path}"
-            raise FileNotFoundError(error_msg)
-        
-        # Load and preprocess data with batch size
-        Training = tf.keras.utils.image_dataset_from_directory(
-            training_path,
-            image_size=(8, 8),
-            batch_size=21,
+    return model_part1
+
+# Per-worker warm cache: the dataset is decoded once and the model is
+# compiled once, its weights and optimizer state being reset per request
+TRAINING_PATH = "./Training"
+TRAINING_CACHE_PATH = os.getenv("TRAINING_CACHE_PATH", "./Training.npz")
+model_cache = WarmModel(build_model_part1, reset=os.getenv("MODEL_RESET", "reinit"))
+training_data = None
+
+def get_training_data():
+    global training_data
+    if training_data is None:
+        try:
+            training_data = load_image_dataset(TRAINING_PATH, image_size=(8, 8), cache_path=TRAINING_CACHE_PATH)
+        except Exception as e:
+            error_msg = f"Failed to load dataset: {str(e)}"
+            raise Exception(error_msg)
+    return training_data
+
+def train_model_part1_batch(items):
+    """
+    Train the model and extract the features once for a batch of requests,
+    over the rows of all of them; each request draws its own 21 images.
+    """
+    all_images, all_labels = get_training_data()
+    # shuffled, as the single batch of 21 images previously read per request
+    orders = [np.random.permutation(len(all_images))[:21] for _item in items]
+    order = np.concatenate(orders)
+    images, labels = all_images[order], all_labels[order]
+
+    with model_cache.model() as model_part1:
+        model_part1.fit(images, labels,
+                              epochs=1,
+                              batch_size=len(images),
+                              verbose=0
         )
-        images, labels = next(iter(Training.as_numpy_iterator()))
-        images = images / 255.0
 
-    except Exception as e:
-        error_msg = f"Failed to load dataset: {str(e)}"
-        raise Exception(error_msg)
+        features = model_part1.predict(images, verbose=0)
+
+    results = []
+    start = 0
+    for rows in orders:
+        end = start + len(rows)
+        results.append({
+            'train_features': features[start:end],
+            'train_labels': labels[start:end],
+            'test_features': features[start:end],
+            'test_labels': labels[start:end],
+        })
+        start = end
+    return results
+
+# Optional micro-batching (MICRO_BATCH_MAX_SIZE > 1, with several gunicorn
+# threads): concurrent requests share one training and forward pass
+micro_batcher = create_micro_batcher(train_model_part1_batch)
 
-    model_part1.fit(images, labels,
-                          epochs=1,
-                          batch_size=21,
-                          verbose=0
-    )
-
-    features = model_part1.predict(images, verbose=0)
+def train_model_part1():
+    if micro_batcher is not None:
+        return micro_batcher.submit(None)
+    return train_model_part1_batch([None])[0]
 
-    return {
-        'train_features': features,
-        'train_labels': labels,
-        'test_features': features,
-        'test_labels': labels,
-    }
+if os.getenv("WARM_START", "1") == "1":
+    # build, compile and trace the model before the first request
+    train_model_part1()
 
 if __name__ == '__main__':
     # Development server only
@@ -7,13 +7,19 @@ from kubernetes import client, config
 from flask import Flask, jsonify, request, g
 import numpy as np
 import logging
-import logging_loki
+from loki_batch_handler import create_loki_handler
+from payload import NPZ_CONTENT_TYPE, decode_arrays
+from warm_cache import WarmModel
+from micro_batching import create_micro_batcher
+from concurrency import configure_tf_threads
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense
 from tensorflow.keras.optimizers import AdamW
 
 tf.get_logger().setLevel('ERROR')
+# TensorFlow threads from the CPU limit of the pod and the concurrency profile
+configure_tf_threads(tf)
 
 app = Flask(__name__)
 
@@ -25,15 +31,8 @@ apps_v1 = client.AppsV1Api()
 # Loki logging setup
 LOKI_URL = os.environ.get("LOKI_URL", "http://loki:3100/loki/api/v1/push")
 
-logging_loki.emitter.LokiEmitter.level_tag = "level"
-loki_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-handler = logging_loki.LokiHandler(
-    url=LOKI_URL,
-    tags={"application": "flask-app-2"},
-    version="1",
-)
-handler.setFormatter(loki_formatter)
+# Records are shipped to Loki in batches by a background thread, off the request path
+handler = create_loki_handler(LOKI_URL, tags={"application": "flask-app-2"})
 
 # Configure loggers
 logger = logging.getLogger("flask-app-2")
@@ -57,25 +56,48 @@ def after_request(response):
     )
     return response
 
+# Rows of the app1 output used by the second part
+ROWS_NEEDED = 10
+PAYLOAD_ARRAYS = ('train_features', 'train_labels', 'test_features', 'test_labels')
+
 @app.route('/')
 def health():
     return 'App 2 is healthy!'
 
+@app.route('/payload-spec', methods=['GET'])
+def payload_spec():
+    """Rows and formats of the app1 output accepted by app2, so that app1 sends only what is used"""
+    return jsonify({
+        'rows': ROWS_NEEDED,
+        'formats': [NPZ_CONTENT_TYPE, 'application/json'],
+    })
+
 @app.route('/run-fire-detector-2', methods=['POST'])
 def train_part2():
-    # Get data from app1's request
-    data = request.get_json()
-        
-    if not data or not data.get('part1_completed', False):
-        return jsonify({
-            'status': 'error',
-            'message': 'Part 1 training was not completed successfully'
-        }), 400
-        
-    train_features = np.array(data['train_features'])[:10]
-    train_labels = np.array(data['train_labels'])[:10]
-    test_features = np.array(data['test_features'])[:10]
-    test_labels = np.array(data['test_labels'])[:10]
+    # Get data from app1's request, as an .npz archive or as JSON
+    if request.mimetype == NPZ_CONTENT_TYPE:
+        try:
+            data = decode_arrays(request.get_data())
+        except Exception:
+            data = None
+        if not data or any(name not in data for name in PAYLOAD_ARRAYS):
+            return jsonify({
+                'status': 'error',
+                'message': 'Part 1 training was not completed successfully'
+            }), 400
+    else:
+        data = request.get_json()
+
+        if not data or not data.get('part1_completed', False):
+            return jsonify({
+                'status': 'error',
+                'message': 'Part 1 training was not completed successfully'
+            }), 400
+
+    train_features = np.asarray(data['train_features'])[:ROWS_NEEDED]
+    train_labels = np.asarray(data['train_labels'])[:ROWS_NEEDED]
+    test_features = np.asarray(data['test_features'])[:ROWS_NEEDED]
+    test_labels = np.asarray(data['test_labels'])[:ROWS_NEEDED]
 
     train_model_part2_from_data(
         train_features, 
@@ -90,21 +112,51 @@ def train_part2():
     }), 200
 
 
-def train_model_part2_from_data(train_features, train_labels, test_features, test_labels):
+def build_model_part2(n_features):
     model_part2 = Sequential()
-    model_part2.add(Dense(256, activation='relu', input_shape=(train_features.shape[1],)))
+    model_part2.add(Dense(256, activation='relu', input_shape=(n_features,)))
     model_part2.add(Dense(1, activation='sigmoid'))
 
     model_part2.compile(optimizer="adam", 
                     loss=tf.keras.losses.BinaryCrossentropy(),
                     metrics=['accuracy'])
+    return model_part2
+
+# Per-worker warm cache: one compiled model per input dimension, its weights
+# and optimizer state being reset per request
+model_cache = WarmModel(build_model_part2, reset=os.getenv("MODEL_RESET", "reinit"))
+
+def train_model_part2_batch(items):
+    """
+    Train the model and run the forward pass once for a batch of requests,
+    over the rows of all of them (grouped by input dimension).
+    """
+    by_dimension = {}
+    for item in items:
+        by_dimension.setdefault(item[0].shape[1], []).append(item)
+
+    for n_features, group in by_dimension.items():
+        train_features, train_labels, test_features, test_labels = (
+            np.concatenate([item[index] for item in group]) for index in range(4)
+        )
+        with model_cache.model(n_features) as model_part2:
+            model_part2.train_on_batch(
+                train_features,
+                train_labels,
+            )
+
+            model_part2.predict(test_features, verbose=0)
+    return [None] * len(items)
+
+# Optional micro-batching (MICRO_BATCH_MAX_SIZE > 1, with several gunicorn
+# threads): concurrent requests share one training step and forward pass
+micro_batcher = create_micro_batcher(train_model_part2_batch)
 
-    model_part2.train_on_batch(
-        train_features,
-        train_labels,
-    )
-
-    model_part2.predict(test_features, verbose=0)
+def train_model_part2_from_data(train_features, train_labels, test_features, test_labels):
+    item = (train_features, train_labels, test_features, test_labels)
+    if micro_batcher is not None:
+        return micro_batcher.submit(item)
+    return train_model_part2_batch([item])[0]
 
 if __name__ == '__main__':
     # Development server only
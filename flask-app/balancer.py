@@ -0,0 +1,58 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from prometheus_client import Gauge
+
+OUTSTANDING_REQUESTS = Gauge(
+    "gateway_endpoint_outstanding_requests", "Requests waiting for each endpoint of a downstream service",
+    ["downstream", "endpoint"]
+)
+
+
+class LeastOutstandingBalancer:
+    """
+    Client-side balancing of the requests to a service over its ready
+    endpoints, to the endpoint with the fewest requests outstanding from this
+    gateway worker, instead of the random choice of kube-proxy.
+
+    With `policy` 'least' all the endpoints are compared, with 'p2c' (power
+    of two choices) the better of two endpoints drawn at random; ties are
+    broken at random. `endpoints_func(service)` returns the base URLs of the
+    ready endpoints; when it returns none (e.g., the endpoints are not known
+    yet), the request is sent to the service URL.
+    """
+    POLICIES = ('least', 'p2c')
+
+    def __init__(self, endpoints_func, policy='p2c'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown balancing policy '{policy}', expected one of {self.POLICIES}")
+        self.endpoints_func = endpoints_func
+        self.policy = policy
+        self.outstanding = {}
+        self.lock = threading.Lock()
+
+    def _choose(self, endpoints):
+        if len(endpoints) == 1:
+            return endpoints[0]
+        if self.policy == 'p2c':
+            endpoints = random.sample(endpoints, 2)
+        least = min(self.outstanding.get(endpoint, 0) for endpoint in endpoints)
+        return random.choice([endpoint for endpoint in endpoints if self.outstanding.get(endpoint, 0) == least])
+
+    @contextmanager
+    def endpoint(self, downstream, service, service_url):
+        """Base URL to which the request is sent, counted as outstanding until the block exits"""
+        endpoints = self.endpoints_func(service)
+        with self.lock:
+            url = self._choose(endpoints) if endpoints else service_url
+            self.outstanding[url] = self.outstanding.get(url, 0) + 1
+        OUTSTANDING_REQUESTS.labels(downstream=downstream, endpoint=url).inc()
+        try:
+            yield url
+        finally:
+            OUTSTANDING_REQUESTS.labels(downstream=downstream, endpoint=url).dec()
+            with self.lock:
+                self.outstanding[url] -= 1
+                if not self.outstanding[url]:
+                    del self.outstanding[url]
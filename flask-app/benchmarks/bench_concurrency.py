@@ -0,0 +1,190 @@
+"""
+Benchmark of the concurrency profiles of an application (see
+gunicorn_config.py): for each profile, closed-loop clients send requests to
+one replica at increasing concurrency levels, and the throughput, the
+response times and the service demand are measured.
+
+The service demand is the CPU time used per request, read from Prometheus
+(the CPU usage of the pods of the deployment) when --prometheus-url is given;
+otherwise the mean response time at concurrency 1 is reported, as measured by
+requests-generator/demand_time_measure.py. It is the `demand` to set in
+log-agent/config.py for the profile that is kept.
+
+With --deployment each profile is applied to the deployment (kubectl set env)
+and rolled out before being measured; keep it at one replica and forward its
+port to --url.
+
+Usage (from the flask-app directory):
+    kubectl port-forward deployment/flask-app-1 5001:5000 &
+    python benchmarks/bench_concurrency.py --url http://localhost:5001 --path /run-fire-detector-1 \\
+        --deployment flask-app-1 --profiles sync gthread:2 gthread:4 gevent --concurrency 1 2 4 \\
+        --prometheus-url http://localhost:9090
+"""
+import argparse
+import json
+import subprocess
+import threading
+import time
+
+import numpy as np
+import requests
+
+
+def parse_profile(profile):
+    """'gthread:4' -> ('gthread', 4), 'sync' -> ('sync', None)"""
+    name, _, threads = profile.partition(":")
+    return name, int(threads) if threads else None
+
+
+def apply_profile(deployment, profile, threads, timeout):
+    """Set the concurrency profile of the deployment and wait for its rollout"""
+    env = [f"CONCURRENCY_PROFILE={profile}"]
+    env.append(f"GUNICORN_THREADS={threads}" if threads else "GUNICORN_THREADS-")
+    subprocess.run(["kubectl", "set", "env", f"deployment/{deployment}", *env], check=True)
+    subprocess.run(["kubectl", "rollout", "status", f"deployment/{deployment}", f"--timeout={int(timeout)}s"], check=True)
+
+
+def wait_healthy(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/", timeout=5).ok:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(2)
+    return False
+
+
+def run_clients(url, concurrency, duration, data=None, headers=None):
+    """Closed-loop clients for `duration` seconds; returns the response times and the errors"""
+    response_times = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            try:
+                response = session.post(url, data=data, headers=headers, timeout=300)
+                ok = response.ok
+            except requests.exceptions.RequestException:
+                ok = False
+            elapsed = time.monotonic() - start
+            with lock:
+                if ok:
+                    response_times.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return response_times, errors[0]
+
+
+def cpu_seconds(prometheus_url, deployment, duration, at):
+    """CPU seconds used by the pods of the deployment in the `duration` seconds before `at`"""
+    query = (
+        f'sum(increase(container_cpu_usage_seconds_total{{pod=~"{deployment}-.*",container!="",container!="POD"}}'
+        f'[{int(round(duration))}s]))'
+    )
+    try:
+        response = requests.get(f"{prometheus_url}/api/v1/query", params={"query": query, "time": at}, timeout=10)
+        response.raise_for_status()
+        result = response.json()["data"]["result"]
+        return float(result[0]["value"][1]) if result else None
+    except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+        print(f"CPU usage not available from Prometheus: {e}")
+        return None
+
+
+def measure(args, request_url, data, headers):
+    levels = []
+    for concurrency in args.concurrency:
+        run_clients(request_url, concurrency, args.warmup, data, headers)
+        started = time.time()
+        response_times, errors = run_clients(request_url, concurrency, args.duration, data, headers)
+        elapsed = time.time() - started
+        level = {
+            "concurrency": concurrency,
+            "completed": len(response_times),
+            "errors": errors,
+            "throughput": len(response_times) / elapsed,
+            "mean_response_time": float(np.mean(response_times)) if response_times else None,
+            "p95_response_time": float(np.percentile(response_times, 95)) if response_times else None,
+            "demand": None,
+        }
+        if args.prometheus_url and args.deployment and response_times:
+            # let Prometheus scrape the end of the run
+            time.sleep(args.scrape_delay)
+            used = cpu_seconds(args.prometheus_url, args.deployment, elapsed, started + elapsed)
+            if used is not None:
+                level["demand"] = used / len(response_times)
+        if level["demand"] is None and concurrency == 1:
+            level["demand"] = level["mean_response_time"]
+        levels.append(level)
+        demand = f"{level['demand']:.3f}s" if level["demand"] is not None else "n/a"
+        print(
+            f"  concurrency {concurrency:3d}: {level['throughput']:.3f} req/s, "
+            f"mean {level['mean_response_time'] or 0:.3f}s, p95 {level['p95_response_time'] or 0:.3f}s, "
+            f"demand {demand}, {errors} errors"
+        )
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the concurrency profiles of an application")
+    parser.add_argument("--url", required=True, help="Base URL of one replica of the application")
+    parser.add_argument("--path", default="/run-fire-detector-1", help="Path of the benchmarked endpoint")
+    parser.add_argument("--payload-url", default=None,
+                        help="URL whose JSON response is POSTed as the payload (e.g., app1 for app2)")
+    parser.add_argument("--deployment", default=None, help="Deployment to which the profiles are applied")
+    parser.add_argument("--profiles", nargs="+", default=None,
+                        help="Profiles to compare, e.g., sync gthread:4 gevent (default: the running one)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4], help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds measured at each concurrency")
+    parser.add_argument("--warmup", type=float, default=10, help="Seconds of warm-up before each measure")
+    parser.add_argument("--prometheus-url", default=None, help="Prometheus, for the CPU time per request")
+    parser.add_argument("--scrape-delay", type=float, default=30, help="Seconds waited for the last scrape")
+    parser.add_argument("--rollout-timeout", type=float, default=300, help="Seconds allowed for each rollout")
+    parser.add_argument("--output", default=None, help="JSON file where the results are written")
+    args = parser.parse_args()
+
+    data, headers = None, None
+    if args.payload_url:
+        response = requests.post(args.payload_url, timeout=300)
+        response.raise_for_status()
+        data, headers = response.content, {"Content-Type": "application/json"}
+
+    profiles = args.profiles or ["current"]
+    if args.profiles and not args.deployment:
+        parser.error("--profiles requires --deployment")
+
+    results = {}
+    for profile in profiles:
+        print(f"Profile {profile}")
+        if profile != "current":
+            name, threads = parse_profile(profile)
+            apply_profile(args.deployment, name, threads, args.rollout_timeout)
+            if not wait_healthy(args.url, args.rollout_timeout):
+                print(f"  {args.url} not reachable, skipping the profile (is the port forwarded?)")
+                continue
+        results[profile] = measure(args, f"{args.url}{args.path}", data, headers)
+
+    print("\nMaximum throughput per replica:")
+    for profile, levels in results.items():
+        best = max(levels, key=lambda level: level["throughput"])
+        print(f"  {profile}: {best['throughput']:.3f} req/s at concurrency {best['concurrency']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
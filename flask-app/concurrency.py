@@ -0,0 +1,84 @@
+import math
+import os
+
+# Gunicorn worker class of each concurrency profile (CONCURRENCY_PROFILE)
+PROFILE_WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "gevent": "gevent",
+}
+DEFAULT_THREADS = {"sync": 1, "gthread": 4, "gevent": 1}
+
+
+def concurrency_profile():
+    profile = os.getenv("CONCURRENCY_PROFILE", "sync")
+    if profile not in PROFILE_WORKER_CLASSES:
+        raise ValueError(f"Unknown concurrency profile '{profile}', expected one of {tuple(PROFILE_WORKER_CLASSES)}")
+    return profile
+
+
+def worker_threads(profile=None):
+    profile = profile or concurrency_profile()
+    return int(os.getenv("GUNICORN_THREADS", DEFAULT_THREADS[profile]))
+
+
+def cpu_limit():
+    """
+    CPUs available to the container: the CPU quota of its cgroup (v2, then
+    v1), otherwise the CPUs of the machine
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return float(os.cpu_count() or 1)
+
+
+def request_concurrency(profile=None):
+    """
+    Requests running inference at the same time in a worker: its threads
+    (gthread, or sync with GUNICORN_THREADS, which gunicorn runs as gthread),
+    each one on its own model of the WarmModel pool, unless micro-batching
+    groups them in one forward pass; one with gevent (the inference does not
+    yield to other greenlets)
+    """
+    profile = profile or concurrency_profile()
+    if profile == "gevent" or int(os.getenv("MICRO_BATCH_MAX_SIZE", 1)) > 1:
+        return 1
+    return max(worker_threads(profile), 1)
+
+
+def tf_thread_settings(profile=None):
+    """
+    (intra-op, inter-op) TensorFlow threads of a worker: the CPU limit of the
+    pod, shared by the workers and by the requests running concurrently in
+    each one, split over the ops of a request (intra-op); the layers of the
+    sequential models run one after the other (inter-op 1). TF_INTRA_OP_THREADS
+    and TF_INTER_OP_THREADS override them.
+    """
+    workers = max(int(os.getenv("GUNICORN_WORKERS", 1)), 1)
+    cpus_per_request = cpu_limit() / workers / request_concurrency(profile)
+    intra_op = int(os.getenv("TF_INTRA_OP_THREADS", max(math.ceil(cpus_per_request), 1)))
+    inter_op = int(os.getenv("TF_INTER_OP_THREADS", 1))
+    return intra_op, inter_op
+
+
+def configure_tf_threads(tf):
+    """Apply tf_thread_settings to TensorFlow, before it runs any op"""
+    intra_op, inter_op = tf_thread_settings()
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    print(f"Concurrency profile {concurrency_profile()}: {intra_op} intra-op and {inter_op} inter-op TensorFlow threads")
+    return intra_op, inter_op
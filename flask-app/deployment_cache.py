@@ -0,0 +1,45 @@
+from watch_cache import WatchCache
+
+
+def deployment_status(deployment):
+    """
+    Replicas of a V1Deployment, as served by /scale-status. The pods not
+    terminated yet ("current") are not part of it: status.replicas drops as
+    soon as the removed pods are marked for deletion, before they drain, so
+    the gateway takes them from the EndpointSlices of the service.
+    """
+    return {
+        "instances": deployment.spec.replicas,
+        "available": deployment.status.available_replicas or 0,
+    }
+
+
+class DeploymentCache(WatchCache):
+    """
+    Replicas of the managed deployments of a namespace, watched in the
+    background (see WatchCache). `get` returns None while the cache is not
+    synced, so that the caller can read the deployment from the API instead.
+
+    `on_update(name, status)` is called with every status received.
+    """
+    def __init__(self, apps_api, namespace, names, watch_timeout=300, retry_interval=1.0, on_update=None):
+        super().__init__(
+            apps_api.list_namespaced_deployment, {"namespace": namespace},
+            watch_timeout=watch_timeout, retry_interval=retry_interval, on_update=on_update,
+            thread_name="deployment-watch"
+        )
+        self.names = set(names)
+
+    def get(self, name):
+        """Status of a managed deployment, None if the cache is not synced"""
+        if not self.synced.is_set():
+            return None
+        with self.lock:
+            status = self.items.get(name)
+            return dict(status) if status is not None else None
+
+    def _keep(self, deployment):
+        return deployment.metadata.name in self.names
+
+    def _value(self, deployment):
+        return deployment_status(deployment)
@@ -0,0 +1,79 @@
+from watch_cache import WatchCache
+
+SERVICE_NAME_LABEL = "kubernetes.io/service-name"
+
+
+def endpoint_slice_addresses(endpoint_slice, default_port=5000, port_name="http"):
+    """
+    Service and base URLs of the ready endpoints of a V1EndpointSlice, and
+    the pods it lists: all the pods not terminated yet, the terminating ones
+    included (draining after a scale-down)
+    """
+    ports = endpoint_slice.ports or []
+    port = next((p.port for p in ports if p.name == port_name), None)
+    if port is None:
+        port = next((p.port for p in ports if p.port is not None), default_port)
+    urls = []
+    pods = []
+    for endpoint in endpoint_slice.endpoints or []:
+        pods.append(endpoint.target_ref.name if endpoint.target_ref is not None else ",".join(endpoint.addresses))
+        conditions = endpoint.conditions
+        # an unknown readiness is interpreted as ready
+        if conditions is not None and (conditions.ready is False or conditions.terminating):
+            continue
+        urls.extend(f"http://{address}:{port}" for address in endpoint.addresses)
+    return {
+        "service": (endpoint_slice.metadata.labels or {}).get(SERVICE_NAME_LABEL),
+        "urls": urls,
+        "pods": pods,
+    }
+
+
+class EndpointSliceCache(WatchCache):
+    """
+    Ready endpoints of the given services, from their EndpointSlices watched
+    in the background (see WatchCache). `endpoints(service)` returns the base
+    URLs (http://address:port) of the ready pods of a service, an empty list
+    while the cache is not synced. `pods(service)` returns the number of pods
+    of a service not terminated yet, None while the cache is not synced.
+
+    `on_update(name, value)` is called with every EndpointSlice received.
+    """
+    def __init__(self, discovery_api, namespace, services, default_port=5000, watch_timeout=300,
+                 retry_interval=1.0, on_update=None):
+        self.services = list(services)
+        self.default_port = default_port
+        self.by_service = {}
+        self.pods_by_service = {}
+        super().__init__(
+            discovery_api.list_namespaced_endpoint_slice,
+            {"namespace": namespace, "label_selector": f"{SERVICE_NAME_LABEL} in ({','.join(self.services)})"},
+            watch_timeout=watch_timeout, retry_interval=retry_interval, on_update=on_update,
+            thread_name="endpoint-slice-watch"
+        )
+
+    def endpoints(self, service):
+        if not self.synced.is_set():
+            return []
+        return self.by_service.get(service, [])
+
+    def pods(self, service):
+        if not self.synced.is_set():
+            return None
+        return self.pods_by_service.get(service, 0)
+
+    def _keep(self, endpoint_slice):
+        return (endpoint_slice.metadata.labels or {}).get(SERVICE_NAME_LABEL) in self.services
+
+    def _value(self, endpoint_slice):
+        return endpoint_slice_addresses(endpoint_slice, default_port=self.default_port)
+
+    def _updated(self):
+        by_service = {}
+        pods_by_service = {}
+        for value in self.items.values():
+            by_service.setdefault(value["service"], set()).update(value["urls"])
+            pods_by_service.setdefault(value["service"], set()).update(value["pods"])
+        # replaced at once, so that they are read without the lock
+        self.by_service = {service: sorted(urls) for service, urls in by_service.items()}
+        self.pods_by_service = {service: len(pods) for service, pods in pods_by_service.items()}
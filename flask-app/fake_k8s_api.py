@@ -0,0 +1,381 @@
+"""
+Minimal fake of the Kubernetes API server, serving the deployment and
+EndpointSlice endpoints used by the gateway, to run the gateway (and the log
+agent scaling loop) outside of a cluster:
+
+- GET   /apis/apps/v1/namespaces/{namespace}/deployments (list, and watch with ?watch=true)
+- GET   /apis/apps/v1/namespaces/{namespace}/deployments/{name}
+- PATCH /apis/apps/v1/namespaces/{namespace}/deployments/{name}
+- GET   /apis/apps/v1/namespaces/{namespace}/deployments/{name}/scale
+- PATCH /apis/apps/v1/namespaces/{namespace}/deployments/{name}/scale
+- GET   /apis/discovery.k8s.io/v1/namespaces/{namespace}/endpointslices (list and watch,
+        with a ?labelSelector on kubernetes.io/service-name)
+
+The available replicas follow the requested replicas after --ready-delay
+seconds. As from the real API server, status.replicas follows the requested
+replicas at once (pods marked for deletion are no longer counted), while the
+removed pods keep draining for --ready-delay seconds. Each deployment has a
+service named {deployment}-service, whose EndpointSlice lists one endpoint
+per pod not terminated yet: pod i at 127.0.0.{i + 1} on the port of the
+service (--service-ports), ready once available, terminating while
+draining. Local servers listening on 0.0.0.0 at these ports thus receive the
+requests balanced by the gateway over the "pods".
+
+Every change gets a new resource version and is sent to the watchers; a
+watch starting from a version older than the last --history events gets a
+410 Gone error event, as from the real API server.
+
+Run with: python fake_k8s_api.py --port 8001 --deployments flask-app-1 flask-app-2
+and start the gateway with K8S_API_URL=http://localhost:8001
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEPLOYMENT_PATH = re.compile(
+    r"^/apis/apps/v1/namespaces/([^/]+)/deployments(?:/([^/]+))?(/scale)?$"
+)
+ENDPOINT_SLICE_PATH = re.compile(
+    r"^/apis/discovery\.k8s\.io/v1/namespaces/([^/]+)/endpointslices$"
+)
+SERVICE_NAME_LABEL = "kubernetes.io/service-name"
+# "key=value" and "key in (value1,value2)" requirements of a label selector
+SELECTOR_REQUIREMENT = re.compile(r"\s*([\w./-]+)\s*(?:==?\s*([\w./-]+)|\s+in\s+\(([^)]*)\))\s*(?:,|$)")
+
+
+def parse_label_selector(selector):
+    """{label: allowed values} of a label selector"""
+    requirements = {}
+    for key, value, values in SELECTOR_REQUIREMENT.findall(selector or ""):
+        requirements[key] = {value} if value else {v.strip() for v in values.split(",")}
+    return requirements
+
+
+def matches(obj, requirements):
+    labels = obj["metadata"].get("labels", {})
+    return all(labels.get(key) in values for key, values in requirements.items())
+
+
+class FakeCluster:
+    """Deployments of one namespace, their EndpointSlices, resource versions and recent events"""
+    def __init__(self, namespace, names, replicas=1, ready_delay=5.0, history=100, service_ports=None):
+        self.namespace = namespace
+        self.ready_delay = ready_delay
+        self.history = history
+        self.service_ports = service_ports or {}
+        self.resource_version = 0
+        self.events = []
+        self.deployments = {}
+        self.endpoint_slices = {}
+        # pods not terminated yet, the draining ones included
+        self.pods = {}
+        self.condition = threading.Condition()
+        for name in names:
+            self.deployments[name] = self._deployment(name, replicas)
+            self.pods[name] = replicas
+            self.endpoint_slices[name] = self._endpoint_slice(self.deployments[name])
+
+    def _next_version(self):
+        self.resource_version += 1
+        return str(self.resource_version)
+
+    def _deployment(self, name, replicas):
+        labels = {"app": name}
+        return {
+            "apiVersion": "apps/v1",
+            "kind": "Deployment",
+            "metadata": {
+                "name": name,
+                "namespace": self.namespace,
+                "labels": labels,
+                "generation": 1,
+                "resourceVersion": self._next_version(),
+            },
+            "spec": {
+                "replicas": replicas,
+                "selector": {"matchLabels": labels},
+                "template": {
+                    "metadata": {"labels": labels},
+                    "spec": {"containers": [{"name": name, "image": f"{name}:latest"}]},
+                },
+            },
+            "status": {
+                "observedGeneration": 1,
+                "replicas": replicas,
+                "readyReplicas": replicas,
+                "availableReplicas": replicas,
+                "updatedReplicas": replicas,
+            },
+        }
+
+    def _endpoint_slice(self, deployment):
+        """EndpointSlice of the service of a deployment, one endpoint per pod not terminated yet"""
+        name = deployment["metadata"]["name"]
+        service = f"{name}-service"
+        status = deployment["status"]
+        endpoints = []
+        for index in range(self.pods[name]):
+            terminating = index >= deployment["spec"]["replicas"]
+            endpoints.append({
+                "addresses": [f"127.0.0.{index + 1}"],
+                "conditions": {
+                    "ready": index < status["availableReplicas"] and not terminating,
+                    "serving": not terminating,
+                    "terminating": terminating,
+                },
+                "targetRef": {"kind": "Pod", "name": f"{name}-{index}", "namespace": self.namespace},
+            })
+        return {
+            "apiVersion": "discovery.k8s.io/v1",
+            "kind": "EndpointSlice",
+            "metadata": {
+                "name": f"{service}-fake",
+                "namespace": self.namespace,
+                "labels": {SERVICE_NAME_LABEL: service},
+                "resourceVersion": self._next_version(),
+            },
+            "addressType": "IPv4",
+            "endpoints": endpoints,
+            "ports": [{"name": "http", "port": self.service_ports.get(name, 5000), "protocol": "TCP"}],
+        }
+
+    def _record(self, kind, obj):
+        """Record a modification of `obj` (condition held)"""
+        self.events.append((self.resource_version, kind, {"type": "MODIFIED", "object": json.loads(json.dumps(obj))}))
+        del self.events[:-self.history]
+        self.condition.notify_all()
+
+    def _changed(self, deployment):
+        """Record a modification of `deployment`, and of its EndpointSlice if any (condition held)"""
+        name = deployment["metadata"]["name"]
+        deployment["metadata"]["resourceVersion"] = self._next_version()
+        self._record("deployments", deployment)
+        endpoint_slice = self._endpoint_slice(deployment)
+        if endpoint_slice["endpoints"] != self.endpoint_slices[name]["endpoints"]:
+            self.endpoint_slices[name] = endpoint_slice
+            self._record("endpointslices", endpoint_slice)
+
+    def list(self, kind="deployments", selector=None):
+        requirements = parse_label_selector(selector)
+        objects = self.deployments if kind == "deployments" else self.endpoint_slices
+        with self.condition:
+            return {
+                "apiVersion": "apps/v1" if kind == "deployments" else "discovery.k8s.io/v1",
+                "kind": "DeploymentList" if kind == "deployments" else "EndpointSliceList",
+                "metadata": {"resourceVersion": str(self.resource_version)},
+                "items": [obj for obj in objects.values() if matches(obj, requirements)],
+            }
+
+    def get(self, name):
+        with self.condition:
+            return self.deployments.get(name)
+
+    def scale(self, name):
+        with self.condition:
+            deployment = self.deployments.get(name)
+            if deployment is None:
+                return None
+            return {
+                "apiVersion": "autoscaling/v1",
+                "kind": "Scale",
+                "metadata": {
+                    "name": name,
+                    "namespace": self.namespace,
+                    "resourceVersion": deployment["metadata"]["resourceVersion"],
+                },
+                "spec": {"replicas": deployment["spec"]["replicas"]},
+                "status": {"replicas": deployment["status"]["replicas"], "selector": f"app={name}"},
+            }
+
+    def set_replicas(self, name, replicas):
+        with self.condition:
+            deployment = self.deployments.get(name)
+            if deployment is None:
+                return None
+            if deployment["spec"]["replicas"] != replicas:
+                deployment["spec"]["replicas"] = replicas
+                deployment["metadata"]["generation"] += 1
+                # new pods are created at once, removed pods drain until
+                # ready_delay but are no longer counted in status.replicas
+                deployment["status"]["replicas"] = replicas
+                self.pods[name] = max(self.pods[name], replicas)
+                deployment["status"]["observedGeneration"] = deployment["metadata"]["generation"]
+                deployment["status"]["updatedReplicas"] = replicas
+                # scaled down pods stop being available at once
+                for field in ("readyReplicas", "availableReplicas"):
+                    deployment["status"][field] = min(deployment["status"][field], replicas)
+                self._changed(deployment)
+                timer = threading.Timer(self.ready_delay, self._ready, (name, deployment["metadata"]["generation"]))
+                timer.daemon = True
+                timer.start()
+        return self.get(name)
+
+    def _ready(self, name, generation):
+        """The pods of a scaled deployment become ready, unless it was scaled again since"""
+        with self.condition:
+            deployment = self.deployments[name]
+            if deployment["metadata"]["generation"] != generation:
+                return
+            replicas = deployment["spec"]["replicas"]
+            self.pods[name] = replicas
+            deployment["status"]["readyReplicas"] = replicas
+            deployment["status"]["availableReplicas"] = replicas
+            self._changed(deployment)
+
+    def events_since(self, resource_version, kind, requirements):
+        """Events of `kind` after `resource_version`, None if they are no longer kept (condition held)"""
+        if self.events and resource_version < self.events[0][0] - 1:
+            return None
+        if not self.events and resource_version < self.resource_version:
+            return None
+        return [
+            event for version, event_kind, event in self.events
+            if version > resource_version and event_kind == kind and matches(event["object"], requirements)
+        ]
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    # the watch events are sent as chunks, which the clients read as they come
+    protocol_version = "HTTP/1.1"
+    cluster = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self, name=None):
+        self._send_json(404, {
+            "kind": "Status", "apiVersion": "v1", "status": "Failure", "reason": "NotFound", "code": 404,
+            "message": f"deployments.apps \"{name}\" not found" if name else "not found",
+        })
+
+    def _route(self):
+        url = urlparse(self.path)
+        found = DEPLOYMENT_PATH.match(url.path)
+        if found is None or found.group(1) != self.cluster.namespace:
+            return None
+        return found.group(2), found.group(3) is not None, parse_qs(url.query)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        found = ENDPOINT_SLICE_PATH.match(url.path)
+        if found is not None and found.group(1) == self.cluster.namespace:
+            return self._list_or_watch("endpointslices", parse_qs(url.query))
+        route = self._route()
+        if route is None:
+            return self._not_found()
+        name, scale, query = route
+        if name is None:
+            return self._list_or_watch("deployments", query)
+        body = self.cluster.scale(name) if scale else self.cluster.get(name)
+        if body is None:
+            return self._not_found(name)
+        self._send_json(200, body)
+
+    def do_PATCH(self):
+        route = self._route()
+        if route is None or route[0] is None:
+            return self._not_found()
+        name, scale, _query = route
+        length = int(self.headers.get("Content-Length", 0))
+        patch = json.loads(self.rfile.read(length) or b"{}")
+        # only the replicas are patched, as merge, strategic merge or JSON patch
+        if isinstance(patch, list):
+            replicas = next((op["value"] for op in patch if op.get("path") == "/spec/replicas"), None)
+        else:
+            replicas = patch.get("spec", {}).get("replicas")
+        if replicas is not None and self.cluster.set_replicas(name, int(replicas)) is None:
+            return self._not_found(name)
+        body = self.cluster.scale(name) if scale else self.cluster.get(name)
+        if body is None:
+            return self._not_found(name)
+        self._send_json(200, body)
+
+    def _list_or_watch(self, kind, query):
+        selector = query.get("labelSelector", [None])[0]
+        if query.get("watch", ["false"])[0] in ("true", "1"):
+            return self._watch(kind, query, parse_label_selector(selector))
+        self._send_json(200, self.cluster.list(kind, selector))
+
+    def _watch(self, kind, query, requirements):
+        resource_version = int(query.get("resourceVersion", ["0"])[0] or 0)
+        deadline = time.monotonic() + int(query.get("timeoutSeconds", ["300"])[0])
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            while time.monotonic() < deadline:
+                with self.cluster.condition:
+                    events = self.cluster.events_since(resource_version, kind, requirements)
+                    if events == []:
+                        # skip past the events of the other objects
+                        resource_version = max(resource_version, self.cluster.events[-1][0] if self.cluster.events else 0)
+                        self.cluster.condition.wait(min(1.0, max(deadline - time.monotonic(), 0)))
+                        events = self.cluster.events_since(resource_version, kind, requirements)
+                if events is None:
+                    self._write_event({"type": "ERROR", "object": {
+                        "kind": "Status", "apiVersion": "v1", "status": "Failure", "reason": "Expired", "code": 410,
+                        "message": f"too old resource version: {resource_version}",
+                    }})
+                    break
+                for event in events:
+                    self._write_event(event)
+                    resource_version = int(event["object"]["metadata"]["resourceVersion"])
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _write_event(self, event):
+        line = json.dumps(event).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Kubernetes API server for the gateway deployments')
+    parser.add_argument('--host', default='127.0.0.1', help='Listening address')
+    parser.add_argument('--port', type=int, default=8001, help='Listening port')
+    parser.add_argument('--namespace', default='default', help='Namespace of the deployments')
+    parser.add_argument('--deployments', nargs='+', default=['flask-app-1', 'flask-app-2'],
+                        help='Names of the deployments')
+    parser.add_argument('--replicas', type=int, default=1, help='Initial replicas of each deployment')
+    parser.add_argument('--ready-delay', type=float, default=5.0,
+                        help='Seconds before the requested replicas become available')
+    parser.add_argument('--history', type=int, default=100, help='Events kept for the watches')
+    parser.add_argument('--service-ports', nargs='*', default=[], metavar='DEPLOYMENT=PORT',
+                        help='Port of the endpoints of the service of a deployment (default 5000)')
+    args = parser.parse_args()
+
+    service_ports = {}
+    for mapping in args.service_ports:
+        name, port = mapping.split('=')
+        service_ports[name] = int(port)
+
+    FakeApiHandler.cluster = FakeCluster(
+        args.namespace, args.deployments, replicas=args.replicas,
+        ready_delay=args.ready_delay, history=args.history, service_ports=service_ports
+    )
+    server = ThreadingHTTPServer((args.host, args.port), FakeApiHandler)
+    server.daemon_threads = True
+    print(f"Fake Kubernetes API server on http://{args.host}:{args.port}, deployments: {', '.join(args.deployments)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,29 @@
 from flask import Flask, jsonify, request, g
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 from kubernetes import client, config
 import logging
-import logging_loki
+from loki_batch_handler import create_loki_handler
+from payload import NPZ_CONTENT_TYPE
+from deployment_cache import DeploymentCache, deployment_status
+from actuation_tracker import ActuationTracker, pending_replicas
+from endpoint_discovery import EndpointSliceCache
+from balancer import LeastOutstandingBalancer
+from admission import AdmissionController, AdmissionRejected
 import time
+from contextlib import contextmanager
 from threading import Lock
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 
 app = Flask(__name__)
 
 # Loki logging setup
 LOKI_URL = os.environ.get("LOKI_URL", "http://loki:3100/loki/api/v1/push")
 
-logging_loki.emitter.LokiEmitter.level_tag = "level"
-loki_handler = logging_loki.LokiHandler(
-    url=LOKI_URL,
-    tags={"application": "gateway"},
-    version="1",
-)
-loki_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+# Records are shipped to Loki in batches by a background thread, off the request path
+loki_handler = create_loki_handler(LOKI_URL, tags={"application": "gateway"})
 
 gateway_logger = logging.getLogger("gateway")
 gateway_logger.setLevel(logging.INFO)
@@ -28,18 +33,61 @@ flask_logger = logging.getLogger('werkzeug')
 flask_logger.setLevel(logging.INFO)
 flask_logger.addHandler(loki_handler)
 
+# Prometheus metrics, exposed on METRICS_PORT (the "metrics" port of the
+# api-gateway pod) so that the timings are scraped instead of parsed from logs
+METRICS_PORT = int(os.getenv("METRICS_PORT", 8000))
+# Set to 0 when the log agent reads the timings from Prometheus, so that
+# the response time lines are no longer shipped to Loki
+LOG_TIMINGS = os.getenv("GATEWAY_LOG_TIMINGS", "1") == "1"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 20.0, 30.0, 60.0)
+ARRIVED_REQUESTS = Counter(
+    "gateway_requests_total", "Requests arrived at the gateway"
+)
+IN_FLIGHT_REQUESTS = Gauge(
+    "gateway_in_flight_requests", "Requests being served by the gateway"
+)
+DOWNSTREAM_REQUESTS = Counter(
+    "gateway_downstream_requests_total", "Requests forwarded to each downstream application", ["downstream"]
+)
+DOWNSTREAM_IN_FLIGHT_REQUESTS = Gauge(
+    "gateway_downstream_in_flight_requests", "Requests waiting for each downstream application", ["downstream"]
+)
+DOWNSTREAM_LATENCY = Histogram(
+    "gateway_downstream_latency_seconds", "Response time of each downstream application, measured by the gateway",
+    ["downstream"], buckets=LATENCY_BUCKETS
+)
+
+try:
+    start_http_server(METRICS_PORT)
+except OSError as e:
+    # already served by another worker of the same pod
+    gateway_logger.warning(f"Metrics server not started on port {METRICS_PORT}: {e}")
+
 # Global counter and lock for incremental IDs
 request_counter = 0
 counter_lock = Lock()
 
-@app.before_request
-def before_request():
+def next_request_id():
     global request_counter
     with counter_lock:
         request_counter += 1
-        g.request_id = request_counter
+        return request_counter
+
+@app.before_request
+def before_request():
+    g.request_id = next_request_id()
+    if request.endpoint == 'gateway':
+        ARRIVED_REQUESTS.inc()
+        IN_FLIGHT_REQUESTS.inc()
+        g.in_flight = True
     flask_logger.info(f"ID: {g.request_id} request arrived")
 
+@app.teardown_request
+def teardown_request(_exception):
+    if g.pop('in_flight', False):
+        IN_FLIGHT_REQUESTS.dec()
+
 @app.after_request
 def after_request(response):
     flask_logger.info(
@@ -50,14 +98,227 @@ def after_request(response):
 APP1_URL = os.getenv("APP1_URL", "http://flask-app-1-service:5000")
 APP2_URL = os.getenv("APP2_URL", "http://flask-app-2-service:5000")
 
-# Initialize Kubernetes client
-config.load_incluster_config()
+# Initialize Kubernetes client: in-cluster, or the API server at K8S_API_URL
+# without authentication (e.g., fake_k8s_api.py, to run the gateway locally)
+K8S_API_URL = os.getenv("K8S_API_URL")
+if K8S_API_URL:
+    k8s_configuration = client.Configuration()
+    k8s_configuration.host = K8S_API_URL
+    client.Configuration.set_default(k8s_configuration)
+else:
+    config.load_incluster_config()
 
 k8s_apps_api = client.AppsV1Api()
 NAMESPACE = os.getenv("NAMESPACE", "default")
 APP1_DEPLOYMENT = os.getenv("APP1_DEPLOYMENT", "flask-app-1")
 APP2_DEPLOYMENT = os.getenv("APP2_DEPLOYMENT", "flask-app-2")
 
+# Replicas of the deployments, watched in the background and served from
+# memory by /scale-status (set DEPLOYMENT_WATCH=0 to read them on every request)
+DEPLOYMENT_WATCH = os.getenv("DEPLOYMENT_WATCH", "1") == "1"
+DEPLOYMENT_WATCH_TIMEOUT = int(os.getenv("DEPLOYMENT_WATCH_TIMEOUT", 300))
+
+# Client-side load balancing of the requests to app1 and app2 over the ready
+# pods of their services, discovered from the EndpointSlices: 'p2c' (power of
+# two choices) or 'least' outstanding requests, 'service' to leave the choice
+# to kube-proxy
+DOWNSTREAM_BALANCER = os.getenv("DOWNSTREAM_BALANCER", "p2c")
+APP1_SERVICE = os.getenv("APP1_SERVICE", "flask-app-1-service")
+APP2_SERVICE = os.getenv("APP2_SERVICE", "flask-app-2-service")
+DOWNSTREAM_SERVICES = {
+    APP1_DEPLOYMENT: (APP1_SERVICE, APP1_URL),
+    APP2_DEPLOYMENT: (APP2_SERVICE, APP2_URL),
+}
+SERVICE_DEPLOYMENTS = {service: deployment for deployment, (service, _url) in DOWNSTREAM_SERVICES.items()}
+
+# Time taken by the deployments to reach the replicas they are scaled to,
+# measured on every status received (watch events, or reads without watch)
+actuation_tracker = ActuationTracker(history=int(os.getenv("ACTUATION_HISTORY", 10)))
+deployment_cache = None
+
+
+def with_pods(name, status):
+    """
+    The status of a deployment with its pods not terminated yet ("current"),
+    counted from the EndpointSlices of its service: unlike status.replicas,
+    they include the pods still draining after a scale-down
+    """
+    pods = endpoint_cache.pods(DOWNSTREAM_SERVICES[name][0]) if endpoint_cache is not None else None
+    return {**status, "current": pods} if pods is not None else status
+
+
+def observe_deployment(name, status):
+    actuation_tracker.observe(name, with_pods(name, status))
+
+
+def observe_endpoints(_name, endpoint_slice):
+    """A change of the pods of a service may complete the scale-down of its deployment"""
+    deployment = SERVICE_DEPLOYMENTS.get(endpoint_slice["service"])
+    status = deployment_cache.get(deployment) if deployment is not None and deployment_cache is not None else None
+    if status is not None:
+        observe_deployment(deployment, status)
+
+
+# The EndpointSlices are watched for the balancer and for the pods of the
+# deployments (the drain of their scale-downs)
+endpoint_cache = EndpointSliceCache(
+    client.DiscoveryV1Api(), NAMESPACE, [APP1_SERVICE, APP2_SERVICE], watch_timeout=DEPLOYMENT_WATCH_TIMEOUT,
+    on_update=observe_endpoints
+).start()
+balancer = None
+if DOWNSTREAM_BALANCER != "service":
+    balancer = LeastOutstandingBalancer(endpoint_cache.endpoints, policy=DOWNSTREAM_BALANCER)
+
+if DEPLOYMENT_WATCH:
+    deployment_cache = DeploymentCache(
+        k8s_apps_api, NAMESPACE, [APP1_DEPLOYMENT, APP2_DEPLOYMENT], watch_timeout=DEPLOYMENT_WATCH_TIMEOUT,
+        on_update=observe_deployment
+    ).start()
+
+
+def get_deployment_status(name):
+    """Replicas of a deployment, from the watch cache when synced, otherwise from the API"""
+    if deployment_cache is not None:
+        status = deployment_cache.get(name)
+        if status is not None:
+            return with_pods(name, status)
+    status = with_pods(name, deployment_status(k8s_apps_api.read_namespaced_deployment(name=name, namespace=NAMESPACE)))
+    actuation_tracker.observe(name, status)
+    return status
+
+
+@contextmanager
+def downstream_endpoint(deployment):
+    """Base URL of the pod (or of the service) to which a request for `deployment` is sent"""
+    service, service_url = DOWNSTREAM_SERVICES[deployment]
+    if balancer is None:
+        yield service_url
+        return
+    with balancer.endpoint(deployment, service, service_url) as url:
+        yield url
+
+
+def available_replicas(name):
+    """Available replicas of a deployment known without an API call, 1 if unknown"""
+    status = deployment_cache.get(name) if deployment_cache is not None else None
+    return status["available"] if status is not None else 1
+
+
+# Admission control of the requests to app1 and app2: 'off' (default),
+# 'static' (ADMISSION_LIMIT_PER_REPLICA requests in flight per available
+# replica) or 'aimd' (limit adapted to the response times, with the
+# thresholds of the log agent as targets). Requests beyond the limit wait up
+# to ADMISSION_MAX_WAIT seconds, then are shed with a 503
+admission = AdmissionController(
+    os.getenv("ADMISSION_MODE", "off"),
+    available_replicas,
+    limit_per_replica=float(os.getenv("ADMISSION_LIMIT_PER_REPLICA", 2)),
+    max_wait=float(os.getenv("ADMISSION_MAX_WAIT", 0)),
+    latency_targets={
+        APP1_DEPLOYMENT: float(os.getenv("APP1_LATENCY_TARGET", 1.1)),
+        APP2_DEPLOYMENT: float(os.getenv("APP2_LATENCY_TARGET", 0.75)),
+    },
+    backoff=float(os.getenv("ADMISSION_BACKOFF", 0.9)),
+    max_limit_per_replica=float(os.getenv("ADMISSION_MAX_LIMIT_PER_REPLICA", 8)),
+)
+
+
+def get_scale_status(name):
+    """Replicas of a deployment, with the replicas still pending, its actuations and its admission"""
+    status = get_deployment_status(name)
+    return {
+        "deployment": name,
+        **status,
+        "pending": pending_replicas(status),
+        **actuation_tracker.status(name),
+        "admission": admission.status(name),
+    }
+
+# Downstream HTTP client, shared by the requests of the worker: connections
+# to app1 and app2 are kept alive in bounded pools. Only failed connection
+# attempts are retried, since the applications train on every request
+DOWNSTREAM_CONNECT_TIMEOUT = float(os.getenv("DOWNSTREAM_CONNECT_TIMEOUT", 3.05))
+DOWNSTREAM_READ_TIMEOUT = float(os.getenv("DOWNSTREAM_READ_TIMEOUT", 300))
+DOWNSTREAM_MAX_RETRIES = int(os.getenv("DOWNSTREAM_MAX_RETRIES", 2))
+DOWNSTREAM_POOL_SIZE = int(os.getenv("DOWNSTREAM_POOL_SIZE", 10))
+
+downstream_session = requests.Session()
+downstream_session.mount("http://", HTTPAdapter(
+    # one pool per pod of app1 and app2 when balanced by the gateway
+    pool_connections=int(os.getenv("DOWNSTREAM_POOL_HOSTS", 16)),
+    pool_maxsize=DOWNSTREAM_POOL_SIZE,
+    pool_block=True,
+    max_retries=Retry(total=DOWNSTREAM_MAX_RETRIES, connect=DOWNSTREAM_MAX_RETRIES, read=0, status=0, backoff_factor=0.1),
+))
+
+# Payload from app1 to app2: 'npz' (binary, when accepted by app2) or 'json',
+# restricted to the rows that app2 declares to use
+PAYLOAD_FORMAT = os.getenv("PAYLOAD_FORMAT", "npz")
+PAYLOAD_SPEC_RETRY_INTERVAL = 60
+app2_payload_spec = None
+app2_payload_spec_retry_at = 0
+
+
+def app1_request_headers():
+    """Headers asking app1 for the rows and format declared by app2, whose spec is fetched once"""
+    global app2_payload_spec, app2_payload_spec_retry_at
+    if app2_payload_spec is None:
+        if time.time() < app2_payload_spec_retry_at:
+            return {}
+        try:
+            response = downstream_session.get(
+                f"{APP2_URL}/payload-spec", timeout=(DOWNSTREAM_CONNECT_TIMEOUT, DOWNSTREAM_CONNECT_TIMEOUT)
+            )
+            response.raise_for_status()
+            app2_payload_spec = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            app2_payload_spec_retry_at = time.time() + PAYLOAD_SPEC_RETRY_INTERVAL
+            gateway_logger.warning(f"app2 payload spec not available, requesting the full JSON payload: {e}")
+            return {}
+
+    headers = {}
+    if app2_payload_spec.get('rows') is not None:
+        headers['X-Max-Rows'] = str(app2_payload_spec['rows'])
+    if PAYLOAD_FORMAT == 'npz' and NPZ_CONTENT_TYPE in app2_payload_spec.get('formats', []):
+        headers['Accept'] = NPZ_CONTENT_TYPE
+    return headers
+
+
+def call_downstream(deployment, path, **kwargs):
+    """
+    POST to a downstream application, recording its response time; returns
+    the response and the elapsed time. Raises AdmissionRejected when the
+    application is over its concurrency limit.
+    """
+    try:
+        admission.acquire(deployment)
+    except AdmissionRejected:
+        if LOG_TIMINGS:
+            gateway_logger.info(f"ID: {g.request_id} | {deployment} request shed")
+        raise
+    DOWNSTREAM_REQUESTS.labels(downstream=deployment).inc()
+    in_flight = DOWNSTREAM_IN_FLIGHT_REQUESTS.labels(downstream=deployment)
+    in_flight.inc()
+    headers = {'X-Request-ID': str(g.request_id), **kwargs.pop('headers', {})}
+    start_time = time.time()
+    response = None
+    try:
+        with downstream_endpoint(deployment) as base_url:
+            response = downstream_session.post(
+                f"{base_url}{path}",
+                headers=headers,
+                timeout=(DOWNSTREAM_CONNECT_TIMEOUT, DOWNSTREAM_READ_TIMEOUT),
+                **kwargs
+            )
+    finally:
+        elapsed_time = time.time() - start_time
+        in_flight.dec()
+        admission.release(deployment, elapsed_time, success=response is not None and response.status_code < 500)
+        DOWNSTREAM_LATENCY.labels(downstream=deployment).observe(elapsed_time)
+    if LOG_TIMINGS:
+        gateway_logger.info(f"ID: {g.request_id} | {deployment} response time: {elapsed_time} seconds")
+    return response, elapsed_time
+
 
 @app.route('/')
 def health():
@@ -66,27 +327,30 @@ def health():
 
 @app.route('/run-fire-detector', methods=['POST'])
 def gateway():
-    app.logger.info('Forwarding request to app1')
-    start_time_app1 = time.time()
-    app1_response = requests.post(
-        f"{APP1_URL}/run-fire-detector-1",
-        headers={'X-Request-ID': str(g.request_id)}
-    )
-    elapsed_time_app1 = time.time() - start_time_app1
-    gateway_logger.info(f"ID: {g.request_id} | {APP1_DEPLOYMENT} response time: {elapsed_time_app1} seconds")
-    app.logger.info('Received response from app1')
-    app1_data = app1_response.json()    
-
-    app.logger.info('Forwarding request to app2')
-    start_time_app2 = time.time()
-    app2_response = requests.post(
-        f"{APP2_URL}/run-fire-detector-2",
-        json=app1_data,
-        headers={'X-Request-ID': str(g.request_id)}
-    )
-    elapsed_time_app2 = time.time() - start_time_app2
-    gateway_logger.info(f"ID: {g.request_id} | {APP2_DEPLOYMENT} response time: {elapsed_time_app2} seconds")
-    app.logger.info('Received response from app2')
+    try:
+        app.logger.info('Forwarding request to app1')
+        app1_response, elapsed_time_app1 = call_downstream(
+            APP1_DEPLOYMENT, "/run-fire-detector-1", headers=app1_request_headers()
+        )
+        app.logger.info('Received response from app1')
+
+        # the app1 payload (JSON or binary) is forwarded as opaque bytes
+        app.logger.info('Forwarding request to app2')
+        app2_response, elapsed_time_app2 = call_downstream(
+            APP2_DEPLOYMENT,
+            "/run-fire-detector-2",
+            data=app1_response.content,
+            headers={'Content-Type': app1_response.headers.get('Content-Type', 'application/json')}
+        )
+        app.logger.info('Received response from app2')
+    except AdmissionRejected as e:
+        return jsonify({"error": str(e), "message": "Downstream application overloaded"}), 503, {"Retry-After": "1"}
+    except requests.exceptions.Timeout as e:
+        app.logger.error(f"Downstream timeout: {str(e)}")
+        return jsonify({"error": str(e), "message": "Downstream application timed out"}), 504
+    except requests.exceptions.RequestException as e:
+        app.logger.error(f"Downstream error: {str(e)}")
+        return jsonify({"error": str(e), "message": "Downstream application unreachable"}), 502
 
     app2_json = app2_response.json()
     app2_json['app1_response_time_sec'] = elapsed_time_app1
@@ -123,18 +387,17 @@ def scale_app():
     except ValueError:
         return jsonify({"error": "Instances must be a valid integer"}), 400
 
+    actuation = None
     try:
-        # Get the deployment
-        deployment = k8s_apps_api.read_namespaced_deployment(name=app_name, namespace=NAMESPACE)
+        # the current replicas, from which the actuation is measured
+        get_deployment_status(app_name)
+        actuation = actuation_tracker.commanded(app_name, instances)
 
-        # Update replicas
-        deployment.spec.replicas = instances
-
-        # Apply the update
-        k8s_apps_api.patch_namespaced_deployment(
+        # Patch only the replicas, through the scale subresource
+        k8s_apps_api.patch_namespaced_deployment_scale(
             name=app_name,
             namespace=NAMESPACE,
-            body=deployment
+            body={"spec": {"replicas": instances}}
         )
 
         app.logger.info(f"Scaled {app_name} to {instances} instances")
@@ -145,6 +408,7 @@ def scale_app():
         })
         
     except client.rest.ApiException as e:
+        actuation_tracker.cancel(app_name, actuation)
         app.logger.error(f"Kubernetes API error: {str(e)}")
         return jsonify({
             "success": False,
@@ -152,6 +416,7 @@ def scale_app():
             "message": f"Failed to scale {app_name}"
         }), 500
     except Exception as e:
+        actuation_tracker.cancel(app_name, actuation)
         app.logger.error(f"Error: {str(e)}")
         return jsonify({
             "success": False,
@@ -163,26 +428,11 @@ def scale_app():
 def scale_status():
     """Get the current number of instances for each app"""
     try:
-        
-        app1_deployment = k8s_apps_api.read_namespaced_deployment(name=APP1_DEPLOYMENT, namespace=NAMESPACE)
-        app2_deployment = k8s_apps_api.read_namespaced_deployment(name=APP2_DEPLOYMENT, namespace=NAMESPACE)
-        
-        app1_replicas = app1_deployment.spec.replicas
-        app2_replicas = app2_deployment.spec.replicas
-        
         return jsonify({
-            "flask-app-1": {
-                "deployment": APP1_DEPLOYMENT,
-                "instances": app1_replicas,
-                "available": app1_deployment.status.available_replicas or 0
-            },
-            "flask-app-2": {
-                "deployment": APP2_DEPLOYMENT,
-                "instances": app2_replicas,
-                "available": app2_deployment.status.available_replicas or 0
-            }
+            "flask-app-1": get_scale_status(APP1_DEPLOYMENT),
+            "flask-app-2": get_scale_status(APP2_DEPLOYMENT)
         })
-        
+
     except client.rest.ApiException as e:
         return jsonify({
             "error": str(e),
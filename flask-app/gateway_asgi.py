@@ -0,0 +1,122 @@
+"""
+ASGI variant of the gateway: the pipeline endpoint is served by an event
+loop with an asynchronous pooled HTTP client, so that one process holds many
+in-flight requests without a thread or greenlet per request. The other
+endpoints (health, scaling) are those of the Flask gateway, mounted as a
+WSGI application, with which the loggers, the metrics and the request IDs
+are shared.
+
+Run with: uvicorn gateway_asgi:app --host 0.0.0.0 --port 5000
+"""
+import os
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+import gateway
+
+DOWNSTREAM_POOL_SIZE = int(os.getenv("DOWNSTREAM_POOL_SIZE", 100))
+
+client = None
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    global client
+    # Only failed connection attempts are retried, as in the Flask gateway
+    client = httpx.AsyncClient(
+        timeout=httpx.Timeout(gateway.DOWNSTREAM_READ_TIMEOUT, connect=gateway.DOWNSTREAM_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=DOWNSTREAM_POOL_SIZE, max_keepalive_connections=DOWNSTREAM_POOL_SIZE),
+        transport=httpx.AsyncHTTPTransport(retries=gateway.DOWNSTREAM_MAX_RETRIES),
+    )
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def call_downstream(request_id, deployment, path, **kwargs):
+    """
+    POST to a downstream application, recording its response time; returns
+    the response and the elapsed time. Raises AdmissionRejected when the
+    application is over its concurrency limit.
+    """
+    try:
+        # the wait for a slot blocks a thread of the pool, not the event loop
+        await run_in_threadpool(gateway.admission.acquire, deployment)
+    except gateway.AdmissionRejected:
+        if gateway.LOG_TIMINGS:
+            gateway.gateway_logger.info(f"ID: {request_id} | {deployment} request shed")
+        raise
+    gateway.DOWNSTREAM_REQUESTS.labels(downstream=deployment).inc()
+    in_flight = gateway.DOWNSTREAM_IN_FLIGHT_REQUESTS.labels(downstream=deployment)
+    in_flight.inc()
+    headers = {'X-Request-ID': str(request_id), **kwargs.pop('headers', {})}
+    start_time = time.time()
+    response = None
+    try:
+        with gateway.downstream_endpoint(deployment) as base_url:
+            response = await client.post(f"{base_url}{path}", headers=headers, **kwargs)
+    finally:
+        elapsed_time = time.time() - start_time
+        in_flight.dec()
+        gateway.admission.release(deployment, elapsed_time, success=response is not None and response.status_code < 500)
+        gateway.DOWNSTREAM_LATENCY.labels(downstream=deployment).observe(elapsed_time)
+    if gateway.LOG_TIMINGS:
+        gateway.gateway_logger.info(f"ID: {request_id} | {deployment} response time: {elapsed_time} seconds")
+    return response, elapsed_time
+
+
+async def run_fire_detector(request):
+    request_id = gateway.next_request_id()
+    gateway.ARRIVED_REQUESTS.inc()
+    gateway.IN_FLIGHT_REQUESTS.inc()
+    gateway.flask_logger.info(f"ID: {request_id} request arrived")
+    response = JSONResponse({"error": "Unexpected error", "message": "An unexpected error occurred"}, status_code=500)
+    try:
+        app1_response, elapsed_time_app1 = await call_downstream(
+            request_id,
+            gateway.APP1_DEPLOYMENT,
+            "/run-fire-detector-1",
+            headers=await run_in_threadpool(gateway.app1_request_headers)
+        )
+        # the app1 payload (JSON or binary) is forwarded as opaque bytes
+        app2_response, elapsed_time_app2 = await call_downstream(
+            request_id,
+            gateway.APP2_DEPLOYMENT,
+            "/run-fire-detector-2",
+            content=app1_response.content,
+            headers={'Content-Type': app1_response.headers.get('Content-Type', 'application/json')}
+        )
+
+        app2_json = app2_response.json()
+        app2_json['app1_response_time_sec'] = elapsed_time_app1
+        app2_json['app2_response_time_sec'] = elapsed_time_app2
+        response = JSONResponse(app2_json)
+    except gateway.AdmissionRejected as e:
+        response = JSONResponse(
+            {"error": str(e), "message": "Downstream application overloaded"}, status_code=503, headers={"Retry-After": "1"}
+        )
+    except httpx.TimeoutException as e:
+        response = JSONResponse({"error": str(e), "message": "Downstream application timed out"}, status_code=504)
+    except httpx.HTTPError as e:
+        response = JSONResponse({"error": str(e), "message": "Downstream application unreachable"}, status_code=502)
+    finally:
+        gateway.IN_FLIGHT_REQUESTS.dec()
+        gateway.flask_logger.info(f"ID: {request_id} request completed with status {response.status_code}.%")
+    return response
+
+
+app = Starlette(
+    routes=[
+        Route('/run-fire-detector', run_fire_detector, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(gateway.app)),
+    ],
+    lifespan=lifespan,
+)
@@ -1,19 +1,29 @@
+from concurrency import PROFILE_WORKER_CLASSES, concurrency_profile, worker_threads
+import os
 
 # Server socket
 bind = "0.0.0.0:5000"
 backlog = 2048
 
-# Worker processes - processor sharing implementation
-# workers = multiprocessing.cpu_count()  # Async workers
-workers = 1  # Only one worker since only one CPU core is set
-worker_class = "sync"  # Sync for processor sharing
-worker_connections = 1000
+# Concurrency profile, selected per deployment with CONCURRENCY_PROFILE:
+# - 'sync' (default): one request at a time per worker
+# - 'gthread': GUNICORN_THREADS threads per worker (default 4), whose requests
+#   share the CPU limit and can be grouped by the micro-batching layer
+#   (MICRO_BATCH_MAX_SIZE)
+# - 'gevent': GUNICORN_WORKER_CONNECTIONS greenlets per worker; the inference
+#   does not yield, so only the I/O of the requests overlaps
+# A sync worker with more than one thread is run by gunicorn as gthread.
+# The TensorFlow threads of the apps are derived from the same settings.
+profile = concurrency_profile()
+workers = int(os.getenv("GUNICORN_WORKERS", 1))  # one CPU per pod
+worker_class = PROFILE_WORKER_CLASSES[profile]
+threads = worker_threads(profile)
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
 timeout = 300
 keepalive = 5
 
-# Gevent-specific settings for processor sharing
-worker_tmp_dir = "/dev/shm"  # Use shared memory for better performance
-preload_app = False  # Disabled to avoid monkey patch conflicts
+worker_tmp_dir = "/dev/shm"  # Use shared memory for the worker heartbeat
+preload_app = False  # Disabled to avoid monkey patch conflicts (gevent)
 
 # Restart workers after this many requests, to help prevent memory leaks
 max_requests = 1000
@@ -25,7 +35,7 @@ accesslog = "-"
 errorlog = "-"
 
 # Process naming
-proc_name = "gunicorn_flask_app_async"
+proc_name = f"gunicorn_flask_app_{profile}"
 
 # Server mechanics
 daemon = False
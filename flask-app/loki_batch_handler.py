@@ -0,0 +1,134 @@
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+import requests
+
+
+class BatchingLokiHandler(logging.Handler):
+    """
+    Logging handler shipping the records to Loki in batches, off the request path.
+
+    `emit` only formats the record and puts it in a bounded in-memory queue. A
+    background thread pushes the queued records in one request per batch, as
+    soon as `batch_size` records are queued or `flush_interval` seconds after
+    the first record of the batch. Each record keeps its own timestamp and the
+    labels of the python-logging-loki handler (the tags plus `logger` and
+    `level`), so that the streams read by the log agent do not change.
+
+    When the queue is full, `overflow_policy` drops either the new record
+    ('drop_new') or the oldest queued one ('drop_oldest'); the dropped records
+    and the failed pushes are counted in `stats()`.
+    """
+    def __init__(self, url, tags, queue_size=10000, batch_size=500, flush_interval=1.0,
+                 overflow_policy="drop_new", timeout=5.0):
+        super().__init__()
+        if overflow_policy not in ("drop_new", "drop_oldest"):
+            raise ValueError(f"Unknown overflow policy '{overflow_policy}', expected 'drop_new' or 'drop_oldest'")
+        self.url = url
+        self.tags = dict(tags)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.timeout = timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.session = requests.Session()
+        self.counters = {"queued": 0, "dropped": 0, "pushed": 0, "failed": 0, "batches": 0}
+        self.counters_lock = threading.Lock()
+        self.closed = threading.Event()
+        self.worker = threading.Thread(target=self._run, name="loki-shipper", daemon=True)
+        self.worker.start()
+        atexit.register(self.close)
+
+    def emit(self, record):
+        try:
+            entry = (
+                str(int(record.created * 1e9)),
+                self.format(record),
+                (("logger", record.name), ("level", record.levelname.lower())),
+            )
+        except Exception:
+            self.handleError(record)
+            return
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            if self.overflow_policy == "drop_oldest":
+                try:
+                    self.queue.get_nowait()
+                    self.queue.put_nowait(entry)
+                except (queue.Empty, queue.Full):
+                    pass
+            self._count("dropped")
+            return
+        self._count("queued")
+
+    def _count(self, name, value=1):
+        with self.counters_lock:
+            self.counters[name] += value
+
+    def stats(self):
+        with self.counters_lock:
+            return {**self.counters, "pending": self.queue.qsize()}
+
+    def _run(self):
+        while not (self.closed.is_set() and self.queue.empty()):
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._push(batch)
+
+    def _push(self, batch):
+        streams = {}
+        for timestamp, line, labels in batch:
+            streams.setdefault(labels, []).append([timestamp, line])
+        payload = {
+            "streams": [
+                {"stream": {**self.tags, **dict(labels)}, "values": sorted(values, key=lambda value: int(value[0]))}
+                for labels, values in streams.items()
+            ]
+        }
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            self._count("pushed", len(batch))
+            self._count("batches")
+        except Exception as e:
+            self._count("failed", len(batch))
+            print(f"Error pushing {len(batch)} log records to Loki: {e}", file=sys.stderr)
+
+    def close(self):
+        """Push the queued records and stop the background thread"""
+        if not self.closed.is_set():
+            self.closed.set()
+            self.worker.join(timeout=self.timeout + self.flush_interval)
+        super().close()
+
+
+def create_loki_handler(url, tags):
+    """Batching Loki handler configured from the LOKI_* environment variables"""
+    handler = BatchingLokiHandler(
+        url=url,
+        tags=tags,
+        queue_size=int(os.getenv("LOKI_QUEUE_SIZE", 10000)),
+        batch_size=int(os.getenv("LOKI_BATCH_SIZE", 500)),
+        flush_interval=float(os.getenv("LOKI_FLUSH_INTERVAL", 1.0)),
+        overflow_policy=os.getenv("LOKI_OVERFLOW_POLICY", "drop_new"),
+        timeout=float(os.getenv("LOKI_PUSH_TIMEOUT", 5.0)),
+    )
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    return handler
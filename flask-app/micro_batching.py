@@ -0,0 +1,89 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from prometheus_client import Histogram, start_http_server
+
+BATCH_SIZE = Histogram(
+    "micro_batch_size", "Requests processed together in one batch",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64)
+)
+QUEUE_DELAY = Histogram(
+    "micro_batch_queue_delay_seconds", "Time spent by a request waiting for its batch to start",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+
+class MicroBatcher:
+    """
+    Group the requests submitted by concurrent request threads into batches.
+
+    The first request of a batch waits at most `max_delay` seconds for other
+    requests (up to `max_batch_size`); `process_batch` is then called once
+    with the items of the whole batch, in a single background thread, and
+    must return one result per item, which is handed back to the waiting
+    request. An exception raised by `process_batch` is raised in every
+    request of the batch.
+    """
+    def __init__(self, process_batch, max_batch_size=8, max_delay=0.01):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, item):
+        """Process `item` in the next batch and return its result (blocking)"""
+        future = Future()
+        self.queue.put((item, future, time.monotonic()))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            started = time.monotonic()
+            BATCH_SIZE.observe(len(batch))
+            for _item, _future, submitted in batch:
+                QUEUE_DELAY.observe(started - submitted)
+            try:
+                results = self.process_batch([item for item, _future, _submitted in batch])
+            except Exception as e:
+                for _item, future, _submitted in batch:
+                    future.set_exception(e)
+                continue
+            for (_item, future, _submitted), result in zip(batch, results):
+                future.set_result(result)
+
+
+def create_micro_batcher(process_batch):
+    """
+    MicroBatcher configured from the MICRO_BATCH_* environment variables, None
+    when micro-batching is disabled (MICRO_BATCH_MAX_SIZE <= 1, the default).
+    The batch size and queueing delay histograms are served on METRICS_PORT.
+    """
+    max_batch_size = int(os.getenv("MICRO_BATCH_MAX_SIZE", 1))
+    if max_batch_size <= 1:
+        return None
+    metrics_port = int(os.getenv("METRICS_PORT", 8000))
+    try:
+        start_http_server(metrics_port)
+    except OSError as e:
+        print(f"Metrics server not started on port {metrics_port}: {e}")
+    return MicroBatcher(
+        process_batch,
+        max_batch_size=max_batch_size,
+        max_delay=float(os.getenv("MICRO_BATCH_MAX_DELAY", 0.01)),
+    )
@@ -0,0 +1,23 @@
+import io
+
+import numpy as np
+
+# Binary payload exchanged between app1 and app2: the arrays of an .npz
+# archive, forwarded by the gateway as opaque bytes
+NPZ_CONTENT_TYPE = "application/x-npz"
+
+
+def encode_arrays(arrays: dict, compress: bool = False) -> bytes:
+    """Serialize named NumPy arrays into an .npz archive (deflated if `compress`)"""
+    buffer = io.BytesIO()
+    if compress:
+        np.savez_compressed(buffer, **arrays)
+    else:
+        np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def decode_arrays(data: bytes) -> dict:
+    """Named NumPy arrays of an .npz archive"""
+    with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+        return {name: archive[name] for name in archive.files}
@@ -24,6 +24,9 @@ helm install prometheus prometheus-community/kube-prometheus-stack \
   --set prometheus-node-exporter.enabled=false \
   --set prometheus-pushgateway.enabled=false
 
+# Scrape the metrics exposed by the gateway on its "metrics" port
+kubectl apply -f gateway-servicemonitor.yaml
+
 kubectl label pods -l app=flask-app-1 monitoring=true
 kubectl label pods -l app=flask-app-2 monitoring=true
 
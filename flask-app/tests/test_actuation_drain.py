@@ -0,0 +1,82 @@
+"""A scale-down is complete when the removed pods have drained, not when status.replicas drops."""
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("kubernetes")
+pytest.importorskip("prometheus_client")
+from kubernetes import client  # noqa: E402
+
+from actuation_tracker import ActuationTracker, pending_replicas  # noqa: E402
+from deployment_cache import deployment_status  # noqa: E402
+from endpoint_discovery import EndpointSliceCache  # noqa: E402
+from fake_k8s_api import FakeApiHandler, FakeCluster  # noqa: E402
+
+DRAIN_SECONDS = 1.0
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def fake_api():
+    cluster = FakeCluster("default", ["flask-app-1"], replicas=3, ready_delay=DRAIN_SECONDS)
+    handler = type("Handler", (FakeApiHandler,), {"cluster": cluster})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    configuration = client.Configuration()
+    configuration.host = f"http://127.0.0.1:{server.server_address[1]}"
+    yield cluster, client.ApiClient(configuration)
+    server.shutdown()
+
+
+def test_status_replicas_drop_before_the_pods_drain(fake_api):
+    cluster, api_client = fake_api
+    apps_api = client.AppsV1Api(api_client)
+    endpoint_cache = EndpointSliceCache(
+        client.DiscoveryV1Api(api_client), "default", ["flask-app-1-service"], watch_timeout=5
+    ).start()
+    assert endpoint_cache.wait_synced(5)
+    assert endpoint_cache.pods("flask-app-1-service") == 3
+
+    apps_api.patch_namespaced_deployment_scale("flask-app-1", "default", {"spec": {"replicas": 1}})
+    deployment = apps_api.read_namespaced_deployment("flask-app-1", "default")
+    assert deployment.status.replicas == 1
+    # the removed pods are still listed, as terminating, while they drain
+    assert wait_for(lambda: endpoint_cache.endpoints("flask-app-1-service") == ["http://127.0.0.1:5000"])
+    assert endpoint_cache.pods("flask-app-1-service") == 3
+    assert wait_for(lambda: endpoint_cache.pods("flask-app-1-service") == 1)
+
+
+def test_scale_down_completes_when_the_pods_are_terminated():
+    tracker = ActuationTracker()
+    tracker.observe("app", {"instances": 3, "available": 3, "current": 3}, at=0)
+    tracker.commanded("app", 1, at=1)
+    # status.replicas is already down, the pods are still draining
+    tracker.observe("app", {"instances": 1, "available": 1, "current": 3}, at=1.1)
+    assert tracker.status("app", at=2)["actuation"]["direction"] == "down"
+    assert pending_replicas({"instances": 1, "available": 1, "current": 3}) == -2
+    # without the pods, the drain is not known to be complete
+    tracker.observe("app", {"instances": 1, "available": 1}, at=2)
+    assert tracker.status("app", at=2)["actuation"] is not None
+    tracker.observe("app", {"instances": 1, "available": 1, "current": 1}, at=6)
+    status = tracker.status("app", at=7)
+    assert status["actuation"] is None
+    assert status["actuations"][-1]["seconds"] == 5
+
+
+def test_deployment_status_does_not_count_status_replicas_as_pods():
+    deployment = client.V1Deployment(
+        spec=client.V1DeploymentSpec(replicas=1, selector=client.V1LabelSelector(), template=client.V1PodTemplateSpec()),
+        status=client.V1DeploymentStatus(replicas=1, available_replicas=1),
+    )
+    assert deployment_status(deployment) == {"instances": 1, "available": 1}
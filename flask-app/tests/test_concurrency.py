@@ -0,0 +1,41 @@
+import pytest
+
+import concurrency
+
+
+@pytest.fixture(autouse=True)
+def four_cpus(monkeypatch):
+    monkeypatch.setattr(concurrency, "cpu_limit", lambda: 4.0)
+    for name in ("CONCURRENCY_PROFILE", "GUNICORN_THREADS", "GUNICORN_WORKERS", "MICRO_BATCH_MAX_SIZE",
+                 "TF_INTRA_OP_THREADS", "TF_INTER_OP_THREADS"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_sync_worker_runs_one_request_on_all_the_cpus():
+    assert concurrency.tf_thread_settings("sync") == (4, 1)
+
+
+def test_gthread_requests_share_the_cpus(monkeypatch):
+    monkeypatch.setenv("GUNICORN_THREADS", "2")
+    assert concurrency.request_concurrency("gthread") == 2
+    assert concurrency.tf_thread_settings("gthread") == (2, 1)
+
+
+def test_sync_with_threads_is_run_as_gthread(monkeypatch):
+    monkeypatch.setenv("GUNICORN_THREADS", "4")
+    assert concurrency.request_concurrency("sync") == 4
+
+
+def test_micro_batching_runs_one_batch_at_a_time(monkeypatch):
+    monkeypatch.setenv("MICRO_BATCH_MAX_SIZE", "8")
+    assert concurrency.tf_thread_settings("gthread") == (4, 1)
+
+
+def test_gevent_inference_does_not_overlap():
+    assert concurrency.request_concurrency("gevent") == 1
+
+
+def test_unknown_profile_is_rejected(monkeypatch):
+    monkeypatch.setenv("CONCURRENCY_PROFILE", "eventlet")
+    with pytest.raises(ValueError):
+        concurrency.concurrency_profile()
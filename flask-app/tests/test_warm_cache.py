@@ -0,0 +1,93 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+from warm_cache import WarmModel, save_arrays  # noqa: E402
+
+
+def test_save_arrays_leaves_no_partial_file(tmp_path):
+    path = tmp_path / "Training.npz"
+    images = np.random.rand(64, 8, 8, 3)
+    save_arrays(str(path), images=images, labels=np.arange(64))
+    assert os.listdir(tmp_path) == ["Training.npz"]
+    with np.load(path) as cache:
+        np.testing.assert_array_equal(cache["images"], images)
+
+
+def test_concurrent_readers_never_see_a_partial_file(tmp_path):
+    path = str(tmp_path / "Training.npz")
+    images = np.random.rand(256, 32, 32, 3)
+    errors = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            if os.path.exists(path):
+                try:
+                    with np.load(path) as cache:
+                        assert cache["images"].shape == images.shape
+                except Exception as e:
+                    errors.append(e)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for _ in range(10):
+        save_arrays(path, images=images, labels=np.arange(256))
+    done.set()
+    for thread in readers:
+        thread.join()
+    assert errors == []
+
+
+def test_failed_write_removes_the_temporary_file(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, "savez", fail)
+    with pytest.raises(OSError):
+        save_arrays(str(tmp_path / "Training.npz"), images=np.zeros(1))
+    assert os.listdir(tmp_path) == []
+
+
+class FakeModel:
+    """Built by the build_fn of the tests: the weights are the only state"""
+    layers = []
+    optimizer = None
+
+    def __init__(self):
+        self.weights = [np.random.rand(2)]
+
+    def get_weights(self):
+        return [w.copy() for w in self.weights]
+
+    def set_weights(self, weights):
+        self.weights = [w.copy() for w in weights]
+
+
+def test_concurrent_requests_get_their_own_models():
+    warm_model = WarmModel(FakeModel, reset='initial')
+    barrier = threading.Barrier(3)
+    used = []
+
+    def request():
+        with warm_model.model() as model:
+            used.append(model)
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(model) for model in used}) == 3
+    # released to the pool and reused, with its own initial weights
+    with warm_model.model() as model:
+        assert model in used
+        model.weights = [np.zeros(2)]
+    with warm_model.model() as reused:
+        assert reused is model
+        assert reused.weights[0].any()
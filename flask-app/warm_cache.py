@@ -0,0 +1,115 @@
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import tensorflow as tf
+
+
+def load_image_dataset(directory, image_size, cache_path=None):
+    """
+    Images (scaled to [0, 1]) and labels of an image directory, decoded once.
+
+    The decoded arrays are saved to `cache_path` (.npz) when given, and read
+    from it by the next workers instead of decoding the images again.
+    """
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path) as cache:
+            return cache['images'], cache['labels']
+
+    if not os.path.exists(directory):
+        raise FileNotFoundError(f"Training data not found at {directory}")
+    dataset = tf.keras.utils.image_dataset_from_directory(
+        directory,
+        image_size=image_size,
+        batch_size=None,
+        shuffle=False,
+    )
+    images, labels = zip(*dataset.as_numpy_iterator())
+    images = np.stack(images) / 255.0
+    labels = np.array(labels)
+
+    if cache_path:
+        try:
+            save_arrays(cache_path, images=images, labels=labels)
+        except OSError as e:
+            print(f"Dataset cache not written to {cache_path}: {e}")
+    return images, labels
+
+
+def save_arrays(path, **arrays):
+    """
+    Save the arrays to the .npz file `path` atomically: they are written to
+    a temporary file in the same directory, then renamed, so that a worker
+    starting at the same time reads either no file or a complete one.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.npz.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class WarmModel:
+    """
+    Compiled Keras models kept by the worker across requests, per key (e.g.,
+    the input dimension), so that the graph is built, compiled and traced
+    only once. Each request takes an idle model of its key, or builds one if
+    all of them are in use by the other threads of the worker, so that
+    concurrent requests train in parallel on their own models; the lock only
+    guards the pool of idle models.
+
+    Before each use the weights and the optimizer state are reset according
+    to `reset`: 'reinit' draws new weights from the initializers of the
+    layers (as a freshly built model), 'initial' restores the weights drawn
+    at build time, 'none' keeps training the same model across requests.
+    """
+    RESET_MODES = ('reinit', 'initial', 'none')
+
+    def __init__(self, build_fn, reset='reinit'):
+        if reset not in self.RESET_MODES:
+            raise ValueError(f"Unknown model reset '{reset}', expected one of {self.RESET_MODES}")
+        self.build_fn = build_fn
+        self.reset = reset
+        # idle (model, initial weights) of each key; a model is used by a
+        # single request at a time
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def model(self, *key):
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            entry = idle.pop() if idle else None
+        if entry is None:
+            model = self.build_fn(*key)
+            entry = (model, model.get_weights())
+        else:
+            self._reset(*entry)
+        try:
+            yield entry[0]
+        finally:
+            with self.lock:
+                self.idle[key].append(entry)
+
+    def _reset(self, model, initial_weights):
+        if self.reset == 'none':
+            return
+        if self.reset == 'initial':
+            model.set_weights(initial_weights)
+        else:
+            for layer in model.layers:
+                for name in ('kernel', 'bias'):
+                    variable = getattr(layer, name, None)
+                    initializer = getattr(layer, f'{name}_initializer', None)
+                    if variable is not None and initializer is not None:
+                        variable.assign(initializer(variable.shape, dtype=variable.dtype))
+        # moments and iteration count of the optimizer, as after compile
+        if model.optimizer is not None:
+            for variable in model.optimizer.variables:
+                if 'learning_rate' not in variable.name:
+                    variable.assign(np.zeros(variable.shape, dtype=variable.dtype))
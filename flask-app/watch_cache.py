@@ -0,0 +1,113 @@
+import threading
+import time
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+HTTP_GONE = 410
+
+
+class WatchCache:
+    """
+    In-memory copy of Kubernetes objects, kept up to date by a background
+    thread as an informer does: the objects are listed once with `list_func`,
+    then watched from the resource version of the list, so that reading them
+    costs no API call.
+
+    The watch is restarted from the last resource version seen when the API
+    server closes it, and the objects are listed again when that version is no
+    longer available (410 Gone). Until the first list succeeds, and while the
+    API server cannot be reached, the cache is not synced, so that the caller
+    can read the objects from the API instead.
+
+    Subclasses select the objects (`_keep`) and what is kept of them
+    (`_value`); `on_update(name, value)` is called with every value received.
+    """
+    def __init__(self, list_func, list_kwargs, watch_timeout=300, retry_interval=1.0, on_update=None,
+                 thread_name="watch-cache"):
+        self.list_func = list_func
+        self.list_kwargs = list_kwargs
+        self.watch_timeout = watch_timeout
+        self.retry_interval = retry_interval
+        self.on_update = on_update
+        self.items = {}
+        self.lock = threading.Lock()
+        self.synced = threading.Event()
+        self.worker = threading.Thread(target=self._run, name=thread_name, daemon=True)
+
+    def start(self):
+        self.worker.start()
+        return self
+
+    def wait_synced(self, timeout=None):
+        return self.synced.wait(timeout)
+
+    def _keep(self, obj):
+        return True
+
+    def _value(self, obj):
+        return obj
+
+    def _updated(self):
+        """Called after every change of the items (lock held)"""
+
+    def _list(self):
+        objects = self.list_func(**self.list_kwargs)
+        values = {obj.metadata.name: self._value(obj) for obj in objects.items if self._keep(obj)}
+        with self.lock:
+            self.items = values
+            self._updated()
+        self.synced.set()
+        if self.on_update is not None:
+            for name, value in values.items():
+                self.on_update(name, value)
+        return objects.metadata.resource_version
+
+    def _apply(self, event_type, obj):
+        if not self._keep(obj):
+            return
+        name = obj.metadata.name
+        if event_type == "DELETED":
+            with self.lock:
+                self.items.pop(name, None)
+                self._updated()
+            return
+        value = self._value(obj)
+        with self.lock:
+            self.items[name] = value
+            self._updated()
+        if self.on_update is not None:
+            self.on_update(name, value)
+
+    def _run(self):
+        resource_version = None
+        while True:
+            try:
+                if resource_version is None:
+                    resource_version = self._list()
+                for event in watch.Watch().stream(
+                    self.list_func,
+                    resource_version=resource_version,
+                    timeout_seconds=self.watch_timeout,
+                    **self.list_kwargs
+                ):
+                    if event["type"] == "ERROR":
+                        if event["raw_object"].get("code") == HTTP_GONE:
+                            resource_version = None
+                            break
+                        raise ApiException(status=event["raw_object"].get("code"),
+                                           reason=event["raw_object"].get("message"))
+                    obj = event["object"]
+                    resource_version = obj.metadata.resource_version
+                    self._apply(event["type"], obj)
+            except ApiException as e:
+                if e.status != HTTP_GONE:
+                    print(f"{self.worker.name} error: {e.status} {e.reason}")
+                    self.synced.clear()
+                    time.sleep(self.retry_interval)
+                resource_version = None
+            except Exception as e:
+                print(f"{self.worker.name} error: {e}")
+                self.synced.clear()
+                resource_version = None
+                time.sleep(self.retry_interval)
@@ -0,0 +1,54 @@
+import time
+from latency_sketch import LatencySketch
+
+
+class ActuationTracker:
+    """
+    Actuation delays of one application, as measured by the gateway from the
+    deployment status: each actuation completed since the start of the run
+    (listed in the scale status) is added once to the time-to-ready (scale-up)
+    or time-to-drain (scale-down) sketch, and the replicas still pending
+    (positive while new replicas are not available, negative while removed
+    ones are draining) are kept as a feature of the application.
+    """
+    DIRECTIONS = {'up': 'time_to_ready', 'down': 'time_to_drain'}
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.sketches = {
+            direction: LatencySketch(relative_accuracy=relative_accuracy, max_buckets=max_buckets)
+            for direction in self.DIRECTIONS
+        }
+        self.run_start = time.time()
+        self.last_started_at = None
+        self.pending_replicas = 0
+        self.actuation_elapsed = 0
+
+    def update(self, status: dict):
+        """Take the scale status of the application (an entry of /scale-status)"""
+        for actuation in status.get('actuations', []):
+            started_at = actuation.get('started_at', 0)
+            if started_at < self.run_start or (self.last_started_at is not None and started_at <= self.last_started_at):
+                continue
+            self.last_started_at = started_at
+            self.sketches[actuation['direction']].add(actuation['seconds'])
+
+        # gateways without actuation tracking only report the available replicas
+        self.pending_replicas = status.get('pending', status.get('instances', 0) - status.get('available', 0))
+        in_progress = status.get('actuation')
+        self.actuation_elapsed = in_progress['elapsed'] if in_progress else 0
+
+    def features(self) -> dict:
+        return {
+            'pending_replicas': self.pending_replicas,
+            'actuation_elapsed': self.actuation_elapsed,
+        }
+
+    def percentiles(self) -> dict:
+        """time_to_ready_p50..., time_to_drain_p50... of the actuations of the run"""
+        percentiles = {}
+        for direction, prefix in self.DIRECTIONS.items():
+            sketch = self.sketches[direction]
+            if sketch.count:
+                percentiles.update(sketch.percentiles(prefix))
+                percentiles[f"{prefix}_count"] = sketch.count
+        return percentiles
@@ -0,0 +1,161 @@
+import time
+from datetime import datetime
+from rl_agent_client import RLAgentClient
+from latency_sketch import LatencySketch
+from history_sink import HistorySink
+from actuation_tracker import ActuationTracker
+from fallback_policies import LastDecisionFallback, AnalyticalSizingFallback, DecisionTableFallback
+from config import CONFIG
+
+
+class AppPipeline:
+    """
+    Decision pipeline of one application managed by the log agent: it turns
+    the metrics collected for the application into a number of instances
+    through its RL agent (or fallback), and keeps its instance history.
+    """
+    def __init__(self, app_name: str, rl_agent_url: str, time_window: float, policy: str = None, decision_table=None):
+        self.app_name = app_name
+        self.rl_agent_url = rl_agent_url
+        self.policy = policy
+        self.decision_table = decision_table
+        self.rl_agent_client = RLAgentClient(
+            app_name=app_name,
+            base_url=rl_agent_url,
+            time_window=time_window,
+            policy=policy,
+            decision_table=decision_table,
+            fallback=self._build_fallback(),
+        )
+        self.last_cpu_usage = 0
+        self.last_gateway_response_metrics = {'mean_response_time': 0}
+        # request and response times since the start of the run
+        self.sketches = {
+            name: LatencySketch(
+                relative_accuracy=CONFIG['latency_sketch']['relative_accuracy'],
+                max_buckets=CONFIG['latency_sketch']['max_buckets']
+            )
+            for name in ('request_time', 'response_time')
+        }
+        # time to ready / drain of the scalings, measured by the gateway
+        self.actuation_tracker = ActuationTracker(
+            relative_accuracy=CONFIG['latency_sketch']['relative_accuracy'],
+            max_buckets=CONFIG['latency_sketch']['max_buckets']
+        )
+        # requests shed by the gateway since its start, at the previous tick
+        self.last_shed_requests = None
+        self.run_start = datetime.now().isoformat()
+        self.instance_history_file = f"{app_name}_instance_history.jsonl"
+        self.history_sink = HistorySink(
+            self.instance_history_file,
+            fsync_every=CONFIG['history']['fsync_every'],
+            fsync_interval=CONFIG['history']['fsync_interval'],
+            max_bytes=CONFIG['history']['max_bytes'],
+        )
+
+    def _build_fallback(self):
+        fallback = CONFIG['rl_agent']['fallback']
+        if fallback is None:
+            fallback = 'decision_table' if self.decision_table is not None else 'last_decision'
+        if fallback == 'last_decision':
+            return LastDecisionFallback()
+        if fallback == 'analytical':
+            return AnalyticalSizingFallback(
+                demand=CONFIG['rl_agent']['demand'][self.app_name],
+                response_time_threshold=CONFIG['rl_agent']['response_time_threshold'][self.app_name],
+                max_n_replicas=CONFIG['rl_agent']['max_n_replicas'],
+            )
+        if fallback == 'decision_table':
+            if self.decision_table is None:
+                raise ValueError("The 'decision_table' fallback requires DECISION_TABLE_PATH")
+            return DecisionTableFallback(self.decision_table)
+        if fallback == 'none':
+            return None
+        raise ValueError(f"Unknown RL agent fallback '{fallback}'")
+
+    def update_sketch(self, name, window_sketch):
+        """Merge the sketch of the window into the cumulative one"""
+        if window_sketch is not None:
+            self.sketches[name].merge(window_sketch)
+
+    def cumulative_percentiles(self):
+        """{request,response}_time_cumulative_p50... since the start of the run"""
+        percentiles = {}
+        for name, sketch in self.sketches.items():
+            if sketch.count:
+                percentiles.update(sketch.percentiles(f"{name}_cumulative"))
+        return percentiles
+
+    def update_actuation(self, status, metrics):
+        """Take the scale status of the application, adding the pending replicas to its metrics"""
+        self.actuation_tracker.update(status)
+        metrics.update(self.actuation_tracker.features())
+
+    def update_admission(self, status, metrics):
+        """Add the requests shed by the gateway admission control in the window to the metrics"""
+        admission = status.get('admission')
+        if not admission:
+            return
+        shed_requests = admission['shed']
+        if self.last_shed_requests is None:
+            # the requests shed before the first tick are not in the window
+            window_shed_requests = 0
+        elif shed_requests < self.last_shed_requests:
+            # the gateway restarted
+            window_shed_requests = shed_requests
+        else:
+            window_shed_requests = shed_requests - self.last_shed_requests
+        self.last_shed_requests = shed_requests
+        metrics['shed_requests'] = window_shed_requests
+        metrics['shed_rate'] = window_shed_requests / metrics['time_window'] if metrics.get('time_window') else 0
+        metrics['admission_limit'] = admission.get('limit')
+
+    def decide(self, metrics, app_replicas):
+        """Number of instances for the application, the current one if no decision can be taken"""
+        if metrics.get("requests_per_second", 0) > 0 and metrics.get("mean_request_time", 0) > 0 and metrics.get("cpu_usage", 0) > 0:
+            app_decision = self.rl_agent_client.action(metrics, n_replicas=app_replicas)
+            if app_decision is not None:
+                return app_decision.get("action")
+            print(f"RL Agent failed, keeping current number of instances of {self.app_name}.")
+        return app_replicas
+
+    def record(self, tick, elapsed_seconds, n_instances, metrics):
+        """Append the tick to the instance history file"""
+        history_entry = {
+            "app_name": self.app_name,
+            "run_start": self.run_start,
+            "timestamp": datetime.now().isoformat(),
+            "elapsed_seconds": elapsed_seconds,
+            "instances": n_instances,
+            "cpu_usage": metrics["cpu_usage"],
+            "requests_per_second": metrics["requests_per_second"],
+            "mean_request_time": metrics["mean_request_time"],
+            "total_arrived_requests": metrics["total_arrived_requests"],
+            "workload": metrics["arrival_rate"],
+            "gateway_mean_response_time": metrics["mean_response_time"],
+            **{key: value for key, value in metrics.items() if key.startswith(('request_time_p', 'response_time_p'))},
+            "pending_replicas": metrics.get("pending_replicas", 0),
+            "actuation_elapsed": metrics.get("actuation_elapsed", 0),
+            "shed_requests": metrics.get("shed_requests", 0),
+            "shed_rate": metrics.get("shed_rate", 0),
+            "admission_limit": metrics.get("admission_limit"),
+            **self.actuation_tracker.percentiles(),
+            "window_start": tick.window_start,
+            "window_end": tick.window_end,
+            "tick_lag": tick.lag,
+            "tick_duration": time.time() - tick.started_at,
+            "skipped_ticks": tick.skipped,
+            "previous_tick_overrun": tick.previous_overrun
+        }
+        try:
+            self.history_sink.append(history_entry)
+        except Exception as e:
+            print(f"Error writing instance history to file: {e}")
+
+    def close(self):
+        """Sync the instance history and close the connection to the RL agent"""
+        try:
+            self.history_sink.close()
+        except Exception as e:
+            print(f"Error closing the instance history file: {e}")
+        self.rl_agent_client.close()
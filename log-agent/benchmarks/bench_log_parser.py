@@ -0,0 +1,106 @@
+"""
+Micro-benchmark of the log-line parser over synthetic windows of werkzeug
+and gateway lines, at the request rates of a load test.
+
+Usage (from the log-agent directory):
+    python benchmarks/bench_log_parser.py --rates 10 100 1000 --time-window 60
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_parser import parse_entries, ARRIVED, COMPLETED, RESPONSE_TIME
+
+APPS = ("flask-app-1", "flask-app-2")
+
+
+def log_line(logger: str, message: str) -> str:
+    """Line as formatted by the Loki handlers of the applications and the gateway"""
+    return f"2025-10-07 23:56:49,048 - {logger} - INFO - {message}"
+
+
+def window_entries(rate: float, time_window: float, seed: int = 0) -> list:
+    """
+    (timestamp, message, stream) entries of a window: for each request the
+    gateway logs its arrival, completion and one response time per app, and
+    each app logs its arrival and completion.
+    """
+    rng = random.Random(seed)
+    entries = []
+    for request_id in range(int(rate * time_window)):
+        timestamp = int(rng.uniform(0, time_window) * 1e9)
+        gateway = {"application": "gateway"}
+        entries.append((timestamp, log_line("werkzeug", f"ID: {request_id} request arrived"), gateway))
+        for app in APPS:
+            stream = {"application": app}
+            response_time = rng.lognormvariate(-0.5, 0.5)
+            entries.append((timestamp, log_line("werkzeug", f"ID: {request_id} request arrived"), stream))
+            entries.append((timestamp, log_line("werkzeug", f"ID: {request_id} request completed with status 200.%"), stream))
+            entries.append((timestamp, log_line("gateway", f"ID: {request_id} | {app} response time: {response_time} seconds"), gateway))
+        entries.append((timestamp, log_line("werkzeug", f"ID: {request_id} request completed with status 200.%"), gateway))
+        entries.append((timestamp, log_line("gateway.app", "Forwarding request to app1"), gateway))
+    return entries
+
+
+def legacy_parse(entries):
+    """The per-line substring scans and splits used before the parser module"""
+    events = 0
+    for _timestamp, message, _stream in entries:
+        match = re.search(r'ID: (\d+)', message)
+        request_id = int(match.group(1)) if match else None
+        if request_id is not None:
+            if "request arrived" in message or "request completed" in message:
+                events += 1
+        if " | " in message and " response time: " in message:
+            try:
+                rest_part = message.split(" | ", 1)[1]
+                _app_name, time_part = rest_part.split(" response time: ", 1)
+                float(time_part.split(" seconds")[0])
+                events += 1
+            except (ValueError, IndexError):
+                pass
+    return events
+
+
+def single_pass_parse(entries):
+    events = 0
+    for _timestamp, _request_id, event, _app_name, _response_time, _stream in parse_entries(entries):
+        if event in (ARRIVED, COMPLETED, RESPONSE_TIME):
+            events += 1
+    return events
+
+
+def best_of(function, entries, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(entries)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the log-line parser")
+    parser.add_argument("--rates", type=float, nargs="+", default=[10, 100, 1000],
+                        help="Request rates (requests per second) to benchmark")
+    parser.add_argument("--time-window", type=float, default=60.0,
+                        help="Seconds of logs parsed at every tick")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Runs of each parser, the best one is reported")
+    args = parser.parse_args()
+
+    print(f"{'rate':>8} {'lines':>9} {'parser':>12} {'window [ms]':>12} {'lines/s':>12}")
+    for rate in args.rates:
+        entries = window_entries(rate, args.time_window)
+        results = set()
+        for name, function in (("legacy", legacy_parse), ("single-pass", single_pass_parse)):
+            elapsed, result = best_of(function, entries, args.repeat)
+            results.add(result)
+            print(f"{rate:>8g} {len(entries):>9} {name:>12} {elapsed * 1000:>12.2f} {len(entries) / elapsed:>12.0f}")
+        if len(results) != 1:
+            print(f"Warning: the parsers disagree on the number of events: {sorted(results)}")
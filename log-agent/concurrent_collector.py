@@ -0,0 +1,64 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+
+class SharedQuery:
+    """
+    A query whose result is shared by several sources of the same tick: the
+    first call runs it, the concurrent and later ones wait for its result.
+    """
+    def __init__(self, query):
+        self.query = query
+        self.lock = threading.Lock()
+        self.done = False
+        self.value = None
+
+    def result(self):
+        with self.lock:
+            if not self.done:
+                self.value = self.query()
+                self.done = True
+            return self.value
+
+
+class ConcurrentCollector:
+    """
+    Run the collection of every metrics source concurrently, each one within
+    its own timeout (in seconds, from the start of the collection).
+
+    A source that misses its timeout yields None for the current tick; it is
+    not submitted again until its previous call has completed, so that a slow
+    source never piles up calls.
+    """
+    def __init__(self, timeouts: dict):
+        self.timeouts = timeouts
+        self.executor = ThreadPoolExecutor(max_workers=len(timeouts), thread_name_prefix="collector")
+        self.pending = {}
+
+    def collect(self, sources: dict) -> dict:
+        """
+        Args:
+            sources (dict): Mapping from source name to the function collecting it.
+        Returns:
+            dict: Mapping from source name to its result (None if failed or late).
+        """
+        start = time.monotonic()
+        futures = {}
+        for name, collect_source in sources.items():
+            if name in self.pending and not self.pending[name].done():
+                print(f"Warning: {name} is still being collected from the previous tick, skipping it.")
+                continue
+            futures[name] = self.pending[name] = self.executor.submit(collect_source)
+
+        results = {name: None for name in sources}
+        for name, future in futures.items():
+            remaining = self.timeouts[name] - (time.monotonic() - start)
+            try:
+                results[name] = future.result(timeout=max(remaining, 0))
+            except TimeoutError:
+                print(f"Warning: {name} not collected within {self.timeouts[name]} seconds.")
+            except Exception as e:
+                print(f"Error collecting {name}: {e}")
+        print(f"Metrics collected in {time.monotonic() - start:.3f} seconds.")
+        return results
@@ -3,9 +3,27 @@ import os
 CONFIG = {
     'loki': {
         'url': os.getenv('LOKI_URL', 'http://localhost:3100'),
+        # Entries per query_range request, windows with more entries are paginated
+        'page_limit': int(os.getenv('LOKI_PAGE_LIMIT', 5000)),
+        # Seconds allowed to collect the logs of a tick (each request included)
+        'timeout': float(os.getenv('LOKI_TIMEOUT', 10)),
+        # 'window': query the whole time window at every tick
+        # 'tail': fetch only the new entries, keeping requests state across windows
+        # 'logql': aggregate counts and response times in Loki (LogQL metric queries)
+        'collection_mode': os.getenv('LOKI_COLLECTION_MODE', 'window'),
+        # In 'logql' mode, also compute the metrics from the raw lines and print both
+        'validate_aggregation': os.getenv('LOKI_VALIDATE_AGGREGATION', '0') == '1',
+        # Seconds after which a request without end is no longer tracked ('tail' mode)
+        'request_max_age': float(os.getenv('LOKI_REQUEST_MAX_AGE', 600)),
+        # Seconds re-queried at every poll for the entries ingested late ('tail' mode)
+        'tail_overlap': float(os.getenv('LOKI_TAIL_OVERLAP', 5)),
     },
     'prometheus': {
         'url': os.getenv('PROMETHEUS_URL', 'http://localhost:9090'),
+        'timeout': float(os.getenv('PROMETHEUS_TIMEOUT', 5)),
+        # Source of the response times measured by the gateway: 'loki' (its
+        # log lines) or 'prometheus' (the histograms on its metrics port)
+        'gateway_metrics_source': os.getenv('GATEWAY_METRICS_SOURCE', 'loki'),
     },
     'rl_agent': {
         "max_workload": 2,
@@ -20,8 +38,47 @@ CONFIG = {
             "flask-app-1": 0.712,
             "flask-app-2": 0.561,
         },
+        # Response time used by the pressure and queue length features:
+        # 'mean_response_time' (default) or a percentile measured by the
+        # gateway, such as 'response_time_p95' (or 'response_time_cumulative_p95')
+        'response_time_statistic': os.getenv('RL_AGENT_RESPONSE_TIME_STATISTIC', 'mean_response_time'),
+        # Fraction of the time window within which the RL agent must answer
+        # (retries included), otherwise the fallback decides
+        'decision_deadline_fraction': float(os.getenv('RL_AGENT_DEADLINE_FRACTION', 0.25)),
+        'max_retries': int(os.getenv('RL_AGENT_MAX_RETRIES', 1)),
+        # Decision used when the RL agent fails: 'last_decision', 'analytical',
+        # 'decision_table' (default when a table is configured) or 'none'
+        'fallback': os.getenv('RL_AGENT_FALLBACK'),
+        # Decision table exported from a trained policy, used locally when
+        # 'local' is set or as a fallback when the RL agent is unreachable
+        'decision_table': {
+            'path': os.getenv('DECISION_TABLE_PATH'),
+            'method': os.getenv('DECISION_TABLE_METHOD', 'nearest'),
+            'local': os.getenv('DECISION_TABLE_LOCAL', '0') == '1',
+        },
+    },
+    'latency_sketch': {
+        # Relative error of the request/response time percentiles
+        'relative_accuracy': float(os.getenv('LATENCY_SKETCH_ACCURACY', 0.01)),
+        # Buckets kept by each sketch, whatever the number of requests
+        'max_buckets': int(os.getenv('LATENCY_SKETCH_MAX_BUCKETS', 2048)),
+    },
+    'history': {
+        # The instance history file is fsynced every `fsync_every` ticks or
+        # `fsync_interval` seconds, and rotated beyond `max_bytes`
+        'fsync_every': int(os.getenv('HISTORY_FSYNC_EVERY', 10)),
+        'fsync_interval': float(os.getenv('HISTORY_FSYNC_INTERVAL', 60)),
+        'max_bytes': int(os.getenv('HISTORY_MAX_BYTES', 64 * 1024 * 1024)),
+    },
+    'scheduler': {
+        # Seconds after the end of each window before collecting it, so that
+        # its last log entries are ingested by Loki
+        'delay': float(os.getenv('LOG_AGENT_TICK_DELAY', 1.0)),
+        # On overrun, 'skip' the missed windows or 'coalesce' them into the next tick
+        'overload_policy': os.getenv('LOG_AGENT_OVERLOAD_POLICY', 'skip'),
     },
     'scale_kubernetes': {
         'url': os.getenv('SCALE_KUBERNETES_URL', 'http://localhost:5000'),
+        'timeout': float(os.getenv('SCALE_KUBERNETES_TIMEOUT', 5)),
     },
 }
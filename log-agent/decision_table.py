@@ -0,0 +1,59 @@
+import itertools
+import numpy as np
+
+
+class DecisionTable:
+    """
+    Precomputed decisions of a trained policy over a grid of the normalized
+    observation space, exported by
+    agent/src/production_agents/DQN/export_decision_table.py.
+
+    Queries run locally with numpy only, either on the nearest grid point or
+    by multilinear interpolation of the actions of the enclosing grid cell.
+    """
+    def __init__(self, actions, keys, axes, method="nearest"):
+        if method not in ("nearest", "multilinear"):
+            raise ValueError(f"Unknown lookup method '{method}', expected 'nearest' or 'multilinear'")
+        self.actions = np.asarray(actions, dtype=np.int8)
+        self.keys = list(keys)
+        self.axes = [np.asarray(axis, dtype=np.float64) for axis in axes]
+        self.method = method
+
+    @classmethod
+    def load(cls, path, method="nearest"):
+        with np.load(path) as table:
+            keys = [str(key) for key in table["keys"]]
+            axes = [table[f"axis_{idx}"] for idx in range(len(keys))]
+            return cls(table["actions"], keys, axes, method=method)
+
+    def action(self, observation):
+        """Return the decision for the observation, as the RL agent `/action` response does."""
+        unknown = sorted(set(observation) - set(self.keys))
+        if unknown:
+            raise ValueError(f"Observation keys {unknown} are not in the decision table {self.keys}")
+        values = [float(observation[key]) for key in self.keys]
+        if self.method == "nearest":
+            action = self._nearest(values)
+        else:
+            action = self._multilinear(values)
+        return {"action": int(action)}
+
+    def _nearest(self, values):
+        index = tuple(int(np.abs(axis - value).argmin()) for axis, value in zip(self.axes, values))
+        return self.actions[index]
+
+    def _multilinear(self, values):
+        cells = []
+        for axis, value in zip(self.axes, values):
+            value = np.clip(value, axis[0], axis[-1])
+            upper = int(np.clip(np.searchsorted(axis, value), 1, len(axis) - 1)) if len(axis) > 1 else 0
+            lower = max(upper - 1, 0)
+            span = axis[upper] - axis[lower]
+            weight = (value - axis[lower]) / span if span > 0 else 0.0
+            cells.append(((lower, 1.0 - weight), (upper, weight)))
+
+        interpolated = 0.0
+        for corner in itertools.product(*cells):
+            index = tuple(idx for idx, _ in corner)
+            interpolated += np.prod([weight for _, weight in corner]) * self.actions[index]
+        return int(np.rint(interpolated))
@@ -0,0 +1,41 @@
+import math
+
+
+class LastDecisionFallback:
+    """Repeat the last decision of the RL agent (keep the current replicas if none yet)."""
+    def action(self, observation, metrics, n_replicas, last_decision):
+        if last_decision is not None:
+            return {"action": last_decision}
+        return {"action": n_replicas}
+
+
+class AnalyticalSizingFallback:
+    """
+    Size the component as a set of processor-sharing servers: with arrival
+    rate `l`, service demand `D` and `n` replicas the response time is
+    `D / (1 - l * D / n)`, which stays below the threshold `T` for
+    `n >= l * D / (1 - D / T)`.
+    """
+    def __init__(self, demand, response_time_threshold, max_n_replicas, min_n_replicas=1):
+        self.demand = demand
+        self.response_time_threshold = response_time_threshold
+        self.max_n_replicas = max_n_replicas
+        self.min_n_replicas = min_n_replicas
+
+    def action(self, observation, metrics, n_replicas, last_decision):
+        arrival_rate = metrics.get("arrival_rate", metrics.get("requests_per_second", 0))
+        headroom = 1 - self.demand / self.response_time_threshold
+        if headroom <= 0:
+            n_instances = self.max_n_replicas
+        else:
+            n_instances = math.ceil(arrival_rate * self.demand / headroom)
+        return {"action": int(min(max(n_instances, self.min_n_replicas), self.max_n_replicas))}
+
+
+class DecisionTableFallback:
+    """Query the decision table exported from the trained policy."""
+    def __init__(self, decision_table):
+        self.decision_table = decision_table
+
+    def action(self, observation, metrics, n_replicas, last_decision):
+        return self.decision_table.action(observation)
@@ -0,0 +1,96 @@
+import glob
+import json
+import os
+import time
+
+
+class HistorySink:
+    """
+    Append-only instance history, one JSON object per line.
+
+    Each tick costs one line written and flushed to the OS, whatever the
+    length of the run. The file is fsynced every `fsync_every` entries or
+    `fsync_interval` seconds, so that a crash loses at most the entries of
+    the last batch, and a line cut by a crash is skipped by the loader. When
+    the active file grows over `max_bytes`, it is rotated into a numbered
+    segment ({stem}.00001.jsonl, {stem}.00002.jsonl...) and a new one is started.
+    """
+    def __init__(self, path: str, fsync_every: int = 10, fsync_interval: float = 60.0, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.stem = path[:-len(".jsonl")] if path.endswith(".jsonl") else path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.file = open(self.path, "a", encoding="utf-8")
+        self._terminate_last_line()
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def _terminate_last_line(self):
+        """End the line left incomplete by a crash, so that the next entry is not appended to it"""
+        if self.file.tell() == 0:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                self.file.write("\n")
+                self.file.flush()
+
+    def append(self, entry: dict):
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every or time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+        if self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def rotate(self):
+        self.sync()
+        self.file.close()
+        segments = _segments(self.stem)
+        index = int(segments[-1].rsplit(".", 2)[-2]) + 1 if segments else 1
+        os.replace(self.path, f"{self.stem}.{index:05d}.jsonl")
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+
+def _segments(stem: str) -> list:
+    return sorted(glob.glob(f"{glob.escape(stem)}.[0-9][0-9][0-9][0-9][0-9].jsonl"))
+
+
+def load_history(path: str, last_run: bool = True) -> list:
+    """
+    Load an instance history as a list of entries, in chronological order.
+
+    Args:
+        path (str): Active .jsonl file of the history (its rotated segments
+            are read first), or a history .json file of the previous format.
+        last_run (bool): Keep only the entries of the last run of the agent.
+    """
+    if path.endswith(".json"):
+        with open(path, "r") as f:
+            return json.load(f)["history"]
+
+    stem = path[:-len(".jsonl")] if path.endswith(".jsonl") else path
+    entries = []
+    for file_path in _segments(stem) + ([path] if os.path.exists(path) else []):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"Warning: skipping the truncated entry at {file_path}:{line_number}")
+
+    if last_run and entries:
+        run_start = entries[-1].get("run_start")
+        entries = [entry for entry in entries if entry.get("run_start") == run_start]
+    return entries
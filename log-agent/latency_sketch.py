@@ -0,0 +1,93 @@
+import heapq
+import math
+
+QUANTILES = (50, 90, 95, 99)
+
+
+class LatencySketch:
+    """
+    Mergeable streaming quantile sketch of positive latencies (in seconds),
+    with logarithmic buckets as in DDSketch.
+
+    Every value falls in the bucket ceil(log_gamma(value)), whose bounds are
+    within `relative_accuracy` of each other, so that any quantile is returned
+    with that relative error. Memory is bounded by `max_buckets`: beyond it,
+    the lowest buckets are collapsed together, trading the accuracy of the low
+    quantiles for the tail ones. Two sketches with the same accuracy are merged
+    by adding their bucket counts.
+    """
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048, min_value: float = 1e-6):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        # values below min_value (zero included) are counted apart
+        self.min_value = min_value
+        self.buckets = {}
+        # min-heap of the bucket indices, to find the lowest ones without sorting
+        self.indices = []
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        if value < self.min_value:
+            self.zero_count += 1
+        else:
+            self._add_to_bucket(math.ceil(math.log(value) / self.log_gamma), 1)
+            if len(self.buckets) > self.max_buckets:
+                self._collapse()
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencySketch"):
+        if other.gamma != self.gamma:
+            raise ValueError("Only sketches with the same relative accuracy can be merged")
+        for index, count in other.buckets.items():
+            self._add_to_bucket(index, count)
+        while len(self.buckets) > self.max_buckets:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _add_to_bucket(self, index: int, count: int):
+        if index in self.buckets:
+            self.buckets[index] += count
+        else:
+            self.buckets[index] = count
+            heapq.heappush(self.indices, index)
+
+    def _collapse(self):
+        """Fold the lowest bucket into the next one"""
+        lowest = heapq.heappop(self.indices)
+        self.buckets[self.indices[0]] += self.buckets.pop(lowest)
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0
+
+    def quantile(self, q: float) -> float:
+        """Value at quantile `q` (in [0, 1]), 0 for an empty sketch"""
+        if self.count == 0:
+            return 0
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return max(self.min, 0)
+        cumulative = self.zero_count
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+            if cumulative > rank:
+                # representative value of the bucket (gamma^(i-1), gamma^i]
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def percentiles(self, prefix: str, quantiles=QUANTILES) -> dict:
+        """{prefix}_p50, {prefix}_p90... of the sketch"""
+        return {f"{prefix}_p{quantile}": self.quantile(quantile / 100) for quantile in quantiles}
@@ -0,0 +1,40 @@
+import re
+
+ARRIVED = "arrived"
+COMPLETED = "completed"
+RESPONSE_TIME = "response_time"
+
+# Messages logged by the applications and the gateway, after the
+# "%(asctime)s - %(name)s - %(levelname)s - " prefix of their Loki handler:
+# werkzeug: "ID: 12 request arrived", "ID: 12 request completed with status 200.%"
+# gateway:  "ID: 12 | flask-app-1 response time: 0.53 seconds"
+LINE_PATTERN = re.compile(
+    r"ID: (\d+) "
+    r"(?:request (arrived|completed)"
+    r"|\| (\S+) response time: ([0-9.eE+-]+) seconds)"
+)
+
+
+def parse_entries(entries):
+    """
+    Yield (timestamp, request_id, event, app_name, response_time, stream) for
+    each (timestamp, message, stream) entry that parses, skipping the others.
+
+    Entries are parsed in a single loop with the pattern bound locally and
+    plain tuples, since this runs over every line of every window.
+    """
+    search = LINE_PATTERN.search
+    for timestamp, message, stream in entries:
+        found = search(message)
+        if found is None:
+            continue
+        request_id, event, app_name, response_time = found.groups()
+        if event is not None:
+            yield timestamp, int(request_id), event, None, None, stream
+            continue
+        try:
+            response_time = float(response_time)
+        except ValueError:
+            continue
+        yield timestamp, int(request_id), RESPONSE_TIME, app_name, response_time, stream
+
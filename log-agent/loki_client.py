@@ -1,32 +1,122 @@
+import heapq
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from config import CONFIG
 
 class LokiClient:
     def __init__(self):
         self.base_url = CONFIG['loki']['url']
+        self.page_limit = CONFIG['loki']['page_limit']
+        self.timeout = CONFIG['loki']['timeout']
+        # Persistent session, shared by the collection and prefetching threads
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=8))
+        # fetches the next page while the current one is being consumed
+        self.prefetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="loki-prefetch")
 
     def query_logs(self, query: str, seconds: float) -> list:
+        end_time = datetime.now()
+        start_time = end_time - timedelta(seconds=seconds)
+
+        end = int(end_time.timestamp() * 1e9)
+        start = int(start_time.timestamp() * 1e9)
+        return self.query_logs_range(query, start=start, end=end)
+
+    def query_logs_range(self, query: str, start: int, end: int) -> list:
+        """Query the logs between the `start` and `end` timestamps (in nanoseconds, both included)."""
         try:
-            end_time = datetime.now()
-            start_time = end_time - timedelta(seconds=seconds)
-
-            end = int(end_time.timestamp() * 1e9)
-            start = int(start_time.timestamp() * 1e9)
-
-            response = requests.get(
-                f"{self.base_url}/loki/api/v1/query_range",
-                params={
-                    "query": query,
-                    "start": start,
-                    "end": end,
-                    "limit": 5000,
-                    "direction": "forward"
-                }
-            )
-            response.raise_for_status()
-            result = response.json().get('data', {}).get('result', [])
-            return result
+            return self._query_page(query, start, end, limit=self.page_limit)
         except Exception as e:
             print(f"Error fetching logs: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def query_instant(self, query: str, time: int = None) -> list:
+        """Evaluate a LogQL metric query at `time` (in nanoseconds, now if None); None on error."""
+        params = {"query": query}
+        if time is not None:
+            params["time"] = time
+        try:
+            response = self.session.get(f"{self.base_url}/loki/api/v1/query", params=params, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json().get('data', {}).get('result', [])
+        except Exception as e:
+            print(f"Error querying Loki metrics: {e}")
+            return None
+
+    def query_by_label(self, query: str, label: str, time: int = None) -> dict:
+        """Samples of the vector returned by a LogQL metric query, keyed by `label`; None on error."""
+        result = self.query_instant(query, time)
+        if result is None:
+            return None
+        values = {}
+        for sample in result:
+            key = sample.get('metric', {}).get(label)
+            values[key] = values.get(key, 0) + float(sample.get('value', [0, 0])[1])
+        return values
+
+    def iter_logs(self, query: str, start: int, end: int):
+        """
+        Yield all the (timestamp [ns], message, stream) entries between the
+        `start` and `end` timestamps (in nanoseconds, both included), sorted by
+        timestamp.
+
+        The window is read in pages of `page_limit` entries, each one starting
+        at the last timestamp of the previous page, so that no entry is lost
+        when the window holds more entries than the Loki limit. The next page
+        is requested as soon as the current one is received, and only these two
+        pages are held in memory.
+        """
+        page_start = start
+        boundary_seen = set()
+        next_page = self.prefetcher.submit(self._query_page, query, page_start, end, self.page_limit)
+        while next_page is not None:
+            try:
+                streams = next_page.result()
+            except Exception as e:
+                print(f"Error fetching logs: {e}")
+                return
+            entries = list(heapq.merge(*[
+                [(int(value[0]), value[1], log.get('stream', {})) for value in log.get('values', [])]
+                for log in streams
+            ], key=lambda x: x[0]))
+
+            next_page = None
+            next_start = None
+            if len(entries) >= self.page_limit:
+                next_start = entries[-1][0]
+                if next_start == page_start:
+                    # the whole page shares one timestamp: move on to avoid looping
+                    print(f"Warning: more than {self.page_limit} log entries at timestamp {next_start}, some were dropped")
+                    next_start += 1
+                if next_start <= end:
+                    next_page = self.prefetcher.submit(self._query_page, query, next_start, end, self.page_limit)
+
+            seen, boundary_seen = boundary_seen, set()
+            for timestamp, message, stream in entries:
+                if timestamp == page_start or timestamp == next_start:
+                    key = (tuple(sorted(stream.items())), message)
+                    if timestamp == page_start and key in seen:
+                        # already returned with the previous page
+                        continue
+                    if timestamp == next_start:
+                        boundary_seen.add(key)
+                yield timestamp, message, stream
+            page_start = next_start
+
+    def _query_page(self, query: str, start: int, end: int, limit: int) -> list:
+        response = self.session.get(
+            f"{self.base_url}/loki/api/v1/query_range",
+            params={
+                "query": query,
+                "start": start,
+                "end": end,
+                "limit": limit,
+                "direction": "forward"
+            },
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        result = response.json().get('data', {}).get('result', [])
+        return result
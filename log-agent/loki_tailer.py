@@ -0,0 +1,87 @@
+from datetime import datetime
+
+
+class LokiTailer:
+    """
+    Incremental reader of a Loki stream selector.
+
+    Each poll queries from the end of the previous one minus `overlap`
+    seconds, to catch the entries ingested with some delay (e.g., the lines
+    of another pod of the application, pushed to the same stream by a later
+    batch). The (timestamp, line) pairs already returned within the queried
+    range are kept for every stream, so that only exact duplicates are
+    filtered and a late entry older than the last one seen is still returned.
+    """
+    def __init__(self, loki_client, query: str, initial_lookback: float, overlap: float = 5.0):
+        self.loki_client = loki_client
+        self.query = query
+        self.initial_lookback = initial_lookback
+        self.overlap = overlap
+        self.seen = {}
+        self.last_poll = None
+
+    def poll(self, end: float = None):
+        """Yield the new (timestamp [s], message, stream) entries up to `end` (now if None), sorted by timestamp."""
+        end_time = end if end is not None else datetime.now().timestamp()
+        if self.last_poll is None:
+            start_ns = int((end_time - self.initial_lookback) * 1e9)
+        else:
+            start_ns = int((self.last_poll - self.overlap) * 1e9)
+        end_ns = int(end_time * 1e9)
+        self.last_poll = end_time
+
+        # entries before the queried range cannot be returned again
+        for stream_key in list(self.seen):
+            seen = {entry for entry in self.seen[stream_key] if entry[0] >= start_ns}
+            if seen:
+                self.seen[stream_key] = seen
+            else:
+                del self.seen[stream_key]
+
+        for timestamp, message, stream in self.loki_client.iter_logs(self.query, start=start_ns, end=end_ns):
+            seen = self.seen.setdefault(tuple(sorted(stream.items())), set())
+            if (timestamp, message) in seen:
+                continue
+            seen.add((timestamp, message))
+            yield timestamp / 1e9, message, stream
+
+
+class RequestTracker:
+    """
+    Start/end state of the requests of an application across time windows.
+
+    A request arrived in a window and completed in a later one is accounted
+    as completed in the latter, with its full duration. Requests without an
+    end are dropped after `max_age` seconds.
+    """
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self.starts = {}
+        self.window = {}
+        self.arrivals = 0
+
+    def start(self, request_id, timestamp: float):
+        self.starts[request_id] = timestamp
+        self.window[request_id] = {'start': timestamp}
+        self.arrivals += 1
+
+    def end(self, request_id, timestamp: float):
+        if request_id not in self.starts:
+            print(f"Warning: Found end time for request {request_id} before start time")
+            return
+        start = self.starts.pop(request_id)
+        self.window[request_id] = {'start': start, 'end': timestamp}
+
+    def active_requests(self) -> int:
+        return len(self.starts)
+
+    def drain_window(self, now: float):
+        """
+        Return the start/end times of the requests seen in the window and the
+        number of requests arrived in it, then open a new window.
+        """
+        for request_id in [r for r, start in self.starts.items() if now - start > self.max_age]:
+            del self.starts[request_id]
+        window, arrivals = self.window, self.arrivals
+        self.window, self.arrivals = {}, 0
+        return window, arrivals
@@ -1,89 +1,295 @@
 import time
 from datetime import datetime
-import re
 import argparse
-import json
+import signal
+import sys
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from loki_client import LokiClient
+from loki_tailer import LokiTailer, RequestTracker
+from concurrent_collector import ConcurrentCollector, SharedQuery
+from scheduler import FixedRateScheduler
 from prometheus_client import PrometheusClient
-from rl_agent_client import RLAgentClient
+from decision_table import DecisionTable
+from app_pipeline import AppPipeline
+from latency_sketch import LatencySketch, QUANTILES
+from log_parser import parse_entries, ARRIVED, COMPLETED, RESPONSE_TIME
 from scale_kubernetes_client import ScaleKubernetesClient
 from config import CONFIG
 
 class LogAgent:
-    def __init__(self, time_window: float, app_name: str, rl_agent_url: str):
+    def __init__(self, time_window: float, apps: list):
+        """
+        Args:
+            time_window (float): Seconds of each collection window (and control period).
+            apps (list): (app_name, rl_agent_url, policy) of each application to manage.
+        """
         self.time_window = time_window
-        self.app_name = app_name
-        self.rl_agent_url = rl_agent_url
         self.loki_client = LokiClient()
+        self.collection_mode = CONFIG['loki']['collection_mode']
+        self.gateway_metrics_source = CONFIG['prometheus']['gateway_metrics_source']
+        self.tailers = {}
+        self.request_trackers = {}
         self.prometheus_client = PrometheusClient()
         self.scale_kubernetes_client = ScaleKubernetesClient()
-        self.instance_history = []
+        self.decision_tables = {}
+        # every source is queried once per tick for all the applications, and
+        # the results are fanned out to the decision pipeline of each one
+        self.pipelines = {
+            app_name: AppPipeline(
+                app_name=app_name,
+                rl_agent_url=rl_agent_url,
+                time_window=time_window,
+                policy=policy,
+                decision_table=self._load_decision_table(app_name),
+            )
+            for app_name, rl_agent_url, policy in apps
+        }
+        self.app_names = list(self.pipelines)
+        self.decision_executor = ThreadPoolExecutor(max_workers=len(self.app_names), thread_name_prefix="decision")
+        # Loki (app and gateway logs), Prometheus and the gateway are queried
+        # concurrently at every tick, each one within its own timeout
+        self.collector = ConcurrentCollector({
+            'app_logs': CONFIG['loki']['timeout'],
+            'gateway_metrics': CONFIG['prometheus']['timeout'] if self.gateway_metrics_source == 'prometheus' else CONFIG['loki']['timeout'],
+            'cpu_usage': CONFIG['prometheus']['timeout'],
+            'scale_status': CONFIG['scale_kubernetes']['timeout'],
+        })
+        self.scheduler = FixedRateScheduler(
+            period=time_window,
+            delay=CONFIG['scheduler']['delay'],
+            overload_policy=CONFIG['scheduler']['overload_policy'],
+        )
+        # time window [start, end] (in seconds) of the current tick
+        self.window = None
         self.start_time = time.time()
 
-    def _extract_request_id(self, log_message):
-        match = re.search(r'ID: (\d+)', log_message)
-        if match:
-            return int(match.group(1))
-        return None
+    def _load_decision_table(self, app_name):
+        """Decision table of `app_name`, DECISION_TABLE_PATH may contain an {app} placeholder"""
+        table_config = CONFIG['rl_agent']['decision_table']
+        if not table_config['path']:
+            return None
+        path = table_config['path'].format(app=app_name)
+        if path not in self.decision_tables:
+            print(f"Loading decision table from {path}")
+            self.decision_tables[path] = DecisionTable.load(path, method=table_config['method'])
+        return self.decision_tables[path]
+
+    def _app_selector(self):
+        """Stream selector of the request logs of all the managed applications"""
+        if len(self.app_names) == 1:
+            return f'{{logger="werkzeug", application="{self.app_names[0]}"}}'
+        applications = "|".join(self.app_names)
+        return f'{{logger="werkzeug", application=~"{applications}"}}'
+
+    def _new_sketch(self):
+        return LatencySketch(
+            relative_accuracy=CONFIG['latency_sketch']['relative_accuracy'],
+            max_buckets=CONFIG['latency_sketch']['max_buckets']
+        )
 
-    def _calculate_mean_request_time(self, request_times):
-        completed_requests = []
+    def _request_time_sketch(self, request_times):
+        """Sketch of the durations of the completed requests"""
+        sketch = self._new_sketch()
         for _req_id, times in request_times.items():
             if 'start' in times and 'end' in times:
-                duration = times['end'] - times['start']
-                completed_requests.append(duration)
-        
-        if completed_requests:
-            return sum(completed_requests) / len(completed_requests)
-        return 0
+                sketch.add(times['end'] - times['start'])
+        return sketch
 
     def _calculate_request_rate(self, request_count: int) -> float:
-        return request_count / self.time_window
+        return request_count / self._window_length()
+
+    def _current_window(self):
+        """[start, end] of the window of the current tick, the last time_window seconds outside the loop"""
+        if self.window is None:
+            end = time.time()
+            return end - self.time_window, end
+        return self.window
+
+    def _window_length(self):
+        start, end = self._current_window()
+        return end - start
+
+    def _window_ns(self):
+        start, end = self._current_window()
+        return int(start * 1e9), int(end * 1e9)
 
     def _unix_to_datetime(self, unix_timestamp):
         return datetime.fromtimestamp(unix_timestamp).isoformat()
     
-    def _extract_gateway_response_time(self, log_message):
-        """Extract response time from gateway logs in format: ID | APP_NAME response time: X seconds"""
-        if " | " in log_message and " response time: " in log_message and self.app_name in log_message:
-            try:
-                parts = log_message.split(" | ", 1)
-                rest_part = parts[1]
-                
-                time_str = rest_part.split(" response time: ")[1].split(" seconds")[0]
-                response_time = float(time_str)
-
-                return response_time
-            except (ValueError, IndexError):
-                return None
-        return None
-
-    def _collect_metrics_by_app(self, application):
-        request_times = defaultdict(dict)
-        logs = self.loki_client.query_logs(f'{{logger="werkzeug", application="{application}"}}', seconds=self.time_window)
-
-        # Sort all log entries by timestamp
-        sorted_logs = []
-        for log in logs:
-            for value in log.get('values', []):
-                sorted_logs.append((float(value[0]), value[1], log.get('stream', {})))
-        sorted_logs.sort(key=lambda x: x[0])
-        
-        # Process logs in chronological order
-        for timestamp, message, _stream in sorted_logs:
+    def _collect_metrics_by_apps(self, logql_mean_response_times=None):
+        """Metrics of each managed application, from a single query for all of them"""
+        if self.collection_mode == 'tail':
+            return self._collect_metrics_by_apps_tail()
+        if self.collection_mode == 'logql':
+            metrics = self._collect_metrics_by_apps_logql(logql_mean_response_times)
+            if metrics is not None and not CONFIG['loki']['validate_aggregation']:
+                return metrics
+            raw_metrics = self._collect_metrics_by_apps_raw()
+            if metrics is None:
+                print("LogQL aggregation failed, using the raw log lines.")
+                return raw_metrics
+            self._print_aggregation_validation(metrics, raw_metrics)
+            return metrics
+        return self._collect_metrics_by_apps_raw()
+
+    def _collect_metrics_by_apps_raw(self):
+        request_times = {application: defaultdict(dict) for application in self.app_names}
+        # Log entries are streamed in chronological order, page by page, and
+        # split by the application label of their stream
+        start, end = self._window_ns()
+        logs = self.loki_client.iter_logs(self._app_selector(), start=start, end=end)
+
+        for timestamp, request_id, event, _app_name, _response_time, stream in parse_entries(logs):
+            app_request_times = request_times.get(stream.get('application'))
+            if app_request_times is None:
+                continue
             timestamp = timestamp / 1e9  # Convert to seconds
-            request_id = self._extract_request_id(message)
-            
-            if request_id:
-                if "request arrived" in message:
-                    request_times[request_id]['start'] = timestamp
-                elif "request completed" in message:
-                    if 'start' in request_times[request_id]:
-                        request_times[request_id]['end'] = timestamp
-                    else:
-                        print(f"Warning: Found end time for request {request_id} before start time")
 
+            if event == ARRIVED:
+                app_request_times[request_id]['start'] = timestamp
+            elif event == COMPLETED:
+                if 'start' in app_request_times[request_id]:
+                    app_request_times[request_id]['end'] = timestamp
+                else:
+                    print(f"Warning: Found end time for request {request_id} before start time")
+
+        return {
+            application: self._app_metrics(
+                application,
+                app_request_times,
+                total_arrived_requests=len(app_request_times),
+                active_requests=len([r for r in app_request_times.values() if 'end' not in r])
+            )
+            for application, app_request_times in request_times.items()
+        }
+
+    def _collect_metrics_by_apps_tail(self):
+        """Collect the metrics from the log entries ingested since the previous tick"""
+        tailer = self._get_tailer(self._app_selector())
+        trackers = {
+            application: self.request_trackers.setdefault(application, RequestTracker(max_age=CONFIG['loki']['request_max_age']))
+            for application in self.app_names
+        }
+
+        for timestamp, request_id, event, _app_name, _response_time, stream in parse_entries(tailer.poll(end=self._current_window()[1])):
+            tracker = trackers.get(stream.get('application'))
+            if tracker is None:
+                continue
+
+            if event == ARRIVED:
+                tracker.start(request_id, timestamp)
+            elif event == COMPLETED:
+                tracker.end(request_id, timestamp)
+
+        metrics = {}
+        for application, tracker in trackers.items():
+            request_times, arrivals = tracker.drain_window(tailer.last_poll)
+            metrics[application] = self._app_metrics(
+                application,
+                request_times,
+                total_arrived_requests=arrivals,
+                active_requests=tracker.active_requests()
+            )
+        return metrics
+
+    def _logql_range(self):
+        return f"{int(self._window_length() * 1000)}ms"
+
+    def _logql_response_time_selector(self):
+        """Response times of the managed applications measured by the gateway, as unwrapped samples labelled by `target`"""
+        targets = "|".join(self.app_names)
+        return (
+            r'{application="gateway"} |= " response time: " '
+            r'| regexp `\| (?P<target>\S+) response time: (?P<response_time>[0-9.eE+-]+) seconds` '
+            f'| target=~"{targets}" '
+            r'| unwrap response_time'
+        )
+
+    def _logql_mean_response_times(self):
+        return self.loki_client.query_by_label(
+            f'avg_over_time({self._logql_response_time_selector()} [{self._logql_range()}]) by (target)',
+            'target',
+            time=self._window_ns()[1]
+        )
+
+    def _collect_metrics_by_apps_logql(self, mean_response_times=None):
+        """
+        Collect the metrics through LogQL metric queries, so that Loki returns
+        a few numbers per application instead of the log lines. Requests are
+        not paired by ID, hence the mean request time is the one measured by
+        the gateway (`mean_response_times`, a SharedQuery of
+        _logql_mean_response_times shared with the gateway metrics).
+        """
+        mean_response_times = mean_response_times or SharedQuery(self._logql_mean_response_times)
+        selector = self._app_selector()
+        arrived = self.loki_client.query_by_label(
+            f'sum by (application) (count_over_time({selector} |= "request arrived" [{self._logql_range()}]))',
+            'application',
+            time=self._window_ns()[1]
+        )
+        completed = self.loki_client.query_by_label(
+            f'sum by (application) (count_over_time({selector} |= "request completed" [{self._logql_range()}]))',
+            'application',
+            time=self._window_ns()[1]
+        )
+        mean_request_times = mean_response_times.result()
+        if arrived is None or completed is None or mean_request_times is None:
+            return None
+
+        metrics = {}
+        for application in self.app_names:
+            app_arrived = int(arrived.get(application, 0))
+            app_completed = int(completed.get(application, 0))
+            metrics[application] = {
+                'application': application,
+                'timestamp': datetime.now().isoformat(),
+                'time_window': self._window_length(),
+                'mean_request_time': mean_request_times.get(application, 0),
+                'active_requests': max(app_arrived - app_completed, 0),
+                'completed_requests': app_completed,
+                'total_arrived_requests': app_arrived,
+                'arrival_rate': app_arrived / self._window_length(),
+                'requests_per_second': self._calculate_request_rate(app_completed),
+                'request_times': {}
+            }
+        return metrics
+
+    def _collect_gateway_response_metrics_logql(self, mean_response_times=None):
+        mean_response_times = (mean_response_times or SharedQuery(self._logql_mean_response_times)).result()
+        if mean_response_times is None:
+            return None
+        metrics = {
+            application: {'mean_response_time': mean_response_times.get(application, 0)}
+            for application in self.app_names
+        }
+        for quantile in (50, 90, 95, 99):
+            values = self.loki_client.query_by_label(
+                f'quantile_over_time({quantile / 100}, {self._logql_response_time_selector()} '
+                f'[{self._logql_range()}]) by (target)',
+                'target',
+                time=self._window_ns()[1]
+            ) or {}
+            for application in self.app_names:
+                metrics[application][f'response_time_p{quantile}'] = values.get(application, 0)
+        return metrics
+
+    def _print_aggregation_validation(self, aggregated, raw):
+        print("LogQL aggregation validation (logql / raw):")
+        for application in self.app_names:
+            print(f"  {application}:")
+            for key in ('mean_request_time', 'total_arrived_requests', 'completed_requests', 'mean_response_time'):
+                if key in aggregated[application] and key in raw[application]:
+                    print(f"    {key}: {aggregated[application][key]} / {raw[application][key]}")
+
+    def _get_tailer(self, query):
+        if query not in self.tailers:
+            self.tailers[query] = LokiTailer(
+                self.loki_client, query, initial_lookback=self.time_window, overlap=CONFIG['loki']['tail_overlap']
+            )
+        return self.tailers[query]
+
+    def _app_metrics(self, application, request_times, total_arrived_requests, active_requests):
         # Convert timestamps to datetime format for output
         formatted_times = {}
         for req_id, times in request_times.items():
@@ -93,45 +299,78 @@ class LogAgent:
             }
 
         completed_requests = len([r for r in request_times.values() if 'end' in r])
+        request_time_sketch = self._request_time_sketch(request_times)
 
         metrics = {
             'application': application,
             'timestamp': datetime.now().isoformat(),
-            'time_window': self.time_window,
-            'mean_request_time': self._calculate_mean_request_time(request_times),
-            'active_requests': len([r for r in request_times.values() if 'end' not in r]),
+            'time_window': self._window_length(),
+            'mean_request_time': request_time_sketch.mean(),
+            **request_time_sketch.percentiles('request_time'),
+            'active_requests': active_requests,
             'completed_requests': completed_requests,
-            'total_arrived_requests': len(request_times),
-            'arrival_rate': len(request_times) / self.time_window,
+            'total_arrived_requests': total_arrived_requests,
+            'arrival_rate': total_arrived_requests / self._window_length(),
             'requests_per_second': self._calculate_request_rate(completed_requests),
-            "cpu_usage": self.prometheus_client.get_average_cpu_usage(application=application, time_window=self.time_window),
-            'request_times': formatted_times
+            'request_times': formatted_times,
+            # merged into the cumulative sketch of the application
+            'request_time_sketch': request_time_sketch
         }
 
         return metrics  
 
-    def _collect_gateway_response_metrics(self):
-        """Collect response time metrics from gateway logs"""
-        app_response_times = []
-        
-        logs = self.loki_client.query_logs('{application="gateway"}', seconds=self.time_window)
+    def _collect_gateway_response_metrics(self, logql_mean_response_times=None):
+        """Collect the response time metrics of each managed application measured by the gateway"""
+        if self.gateway_metrics_source == 'prometheus':
+            metrics = self.prometheus_client.get_gateway_response_metrics(
+                applications=self.app_names, time_window=self._window_length(), at=self._current_window()[1]
+            )
+            if metrics is not None:
+                return metrics
+            print("Gateway metrics not available from Prometheus, using the gateway logs.")
+        if self.collection_mode == 'logql':
+            metrics = self._collect_gateway_response_metrics_logql(logql_mean_response_times)
+            if metrics is not None and not CONFIG['loki']['validate_aggregation']:
+                return metrics
+            raw_metrics = self._collect_gateway_response_metrics_raw()
+            if metrics is None:
+                print("LogQL aggregation failed, using the raw log lines.")
+                return raw_metrics
+            self._print_aggregation_validation(metrics, raw_metrics)
+            return metrics
+        return self._collect_gateway_response_metrics_raw()
+
+    def _collect_gateway_response_metrics_raw(self):
+        # the gateway stream is parsed once for all the managed applications
+        app_response_times = {application: self._new_sketch() for application in self.app_names}
         
-        for log in logs:
-            for value in log.get('values', []):
-                message = value[1]
-                response_time = self._extract_gateway_response_time(message)
-                if response_time is not None:
-                    app_response_times.append(response_time)
+        if self.collection_mode == 'tail':
+            entries = self._get_tailer('{application="gateway"}').poll(end=self._current_window()[1])
+        else:
+            start, end = self._window_ns()
+            entries = self.loki_client.iter_logs('{application="gateway"}', start=start, end=end)
+
+        for _timestamp, _request_id, event, app_name, response_time, _stream in parse_entries(entries):
+            if event == RESPONSE_TIME and app_name in app_response_times:
+                app_response_times[app_name].add(response_time)
 
         return {
-                'mean_response_time': sum(app_response_times) / len(app_response_times) if app_response_times else 0,
+            application: {
+                'mean_response_time': sketch.mean(),
+                **sketch.percentiles('response_time'),
+                'response_time_sketch': sketch,
             }
+            for application, sketch in app_response_times.items()
+        }
 
 
     def _format_metrics(self, metrics):
         separator = "=" * 80
         app_header = f"\n{separator}\n{' ' * 30}{metrics['application']}\n{separator}"
         
+        percentile_names = "/".join(f"p{quantile}" for quantile in QUANTILES)
+        request_time_percentiles = " / ".join(f"{metrics.get(f'request_time_p{quantile}', 0):.6f}" for quantile in QUANTILES)
+
         # Format the basic metrics
         basic_metrics = f"""
 Timestamp: {metrics['timestamp']}
@@ -140,6 +379,7 @@ Time Window: {metrics['time_window']} seconds
 Performance Metrics:
 ------------------
 Mean Request Time: {metrics['mean_request_time']}
+Request Time Percentiles ({percentile_names}): {request_time_percentiles}
 Active Requests: {metrics['active_requests']}
 Completed Requests: {metrics['completed_requests']}
 Total Arrived Requests: {metrics['total_arrived_requests']}
@@ -166,93 +406,163 @@ Requests per Second: {metrics['requests_per_second']}
 
         header = "\nGATEWAY RESPONSE METRICS:\n" + "=" * 30
         metrics_info = f"\nmean: {gateway_metrics['mean_response_time']:.6f}s"
+        for quantile in QUANTILES:
+            if f'response_time_p{quantile}' in gateway_metrics:
+                metrics_info += f"\np{quantile}: {gateway_metrics[f'response_time_p{quantile}']:.6f}s"
+        if 'gateway_in_flight_requests' in gateway_metrics:
+            metrics_info += f"\nin flight: {gateway_metrics['gateway_in_flight_requests']:.0f}"
+            metrics_info += f"\narrived: {gateway_metrics['gateway_arrived_requests']:.0f}"
 
         return f"{header}{metrics_info}\n"
         
     def _collect_metrics(self):
-        metrics_app = self._collect_metrics_by_app(self.app_name)
-        gateway_response_metrics = self._collect_gateway_response_metrics()
-        
-        print(self._format_metrics(metrics_app))
-        print(self._format_gateway_response_metrics(gateway_response_metrics))
-        print("=" * 80 + "\n")
-        
-        metrics = {
-            self.app_name: { **metrics_app, **gateway_response_metrics }
-        }
-        return metrics
+        """
+        Collect the application logs, the gateway logs, the CPU usage and the
+        scaling status concurrently, each with one query for all the managed
+        applications. Returns the metrics by application (None if the
+        application logs could not be collected) and the scaling status.
+        A late CPU usage or gateway response time is replaced by the last one.
+        """
+        # in the logql mode the mean response time per application is both the
+        # mean request time and the gateway mean: it is queried once per tick
+        logql_mean_response_times = SharedQuery(self._logql_mean_response_times)
+        results = self.collector.collect({
+            'app_logs': lambda: self._collect_metrics_by_apps(logql_mean_response_times),
+            'gateway_metrics': lambda: self._collect_gateway_response_metrics(logql_mean_response_times),
+            'cpu_usage': lambda: self.prometheus_client.get_average_cpu_usage_by_app(
+                applications=self.app_names, time_window=self._window_length(), at=self._current_window()[1]
+            ),
+            'scale_status': self.scale_kubernetes_client.get_scale_status,
+        })
+
+        metrics = {}
+        for application, pipeline in self.pipelines.items():
+            if results['cpu_usage'] is not None:
+                pipeline.last_cpu_usage = results['cpu_usage'][application]
+            if results['gateway_metrics'] is not None:
+                gateway_response_metrics = results['gateway_metrics'][application]
+                pipeline.update_sketch('response_time', gateway_response_metrics.pop('response_time_sketch', None))
+                pipeline.last_gateway_response_metrics = gateway_response_metrics
+            if results['app_logs'] is None:
+                continue
+
+            metrics_app = results['app_logs'][application]
+            pipeline.update_sketch('request_time', metrics_app.pop('request_time_sketch', None))
+            metrics_app['cpu_usage'] = pipeline.last_cpu_usage
+            gateway_response_metrics = pipeline.last_gateway_response_metrics
+
+            print(self._format_metrics(metrics_app))
+            print(self._format_gateway_response_metrics(gateway_response_metrics))
+            print("=" * 80 + "\n")
+
+            metrics[application] = { **metrics_app, **gateway_response_metrics, **pipeline.cumulative_percentiles() }
+
+        if results['app_logs'] is None:
+            return None, results['scale_status']
+        return metrics, results['scale_status']
+
+    def _run_pipeline(self, pipeline, tick, elapsed_seconds, metrics, status):
+        app_name = pipeline.app_name
+        if status.get(app_name) is None:
+            print(f"Error: No scaling status for {app_name}, keeping current number of instances.")
+            return
+        app_replicas = status.get(app_name).get('instances')
+        pipeline.update_actuation(status.get(app_name), metrics[app_name])
+        pipeline.update_admission(status.get(app_name), metrics[app_name])
+        n_instances_app = pipeline.decide(metrics[app_name], app_replicas)
+        # Only scale if there's a change needed
+        if n_instances_app != app_replicas:
+            print(f"Scaling {app_name} from {app_replicas} to {n_instances_app} instances")
+            self.scale_kubernetes_client.scale_app(app_name, n_instances_app)
+
+        pipeline.record(tick, elapsed_seconds, n_instances_app, metrics[app_name])
 
     def run(self):
-        instance_history_file = f"{self.app_name}_instance_history.json"
-        while True:
-            metrics = self._collect_metrics()
+        try:
+            self._run_ticks()
+        finally:
+            self.close()
+
+    def close(self):
+        """Wait for the running decisions, then sync the histories and close the connections"""
+        self.decision_executor.shutdown(wait=True)
+        for pipeline in self.pipelines.values():
+            pipeline.close()
+
+    def _run_ticks(self):
+        # one tick per aligned time window, at fixed wall-clock boundaries
+        for tick in self.scheduler.ticks():
+            self.window = (tick.window_start, tick.window_end)
+            metrics, status = self._collect_metrics()
             current_time = time.time()
             elapsed_seconds = int(current_time - self.start_time)
 
-            # Get the current status to determine current replicas
-            status = self.scale_kubernetes_client.get_scale_status()
-
             if not status:
                 print("Error: Unable to retrieve scaling status.")
                 continue
             print(f"Current scaling status: {status}")
 
+            if metrics is None:
+                print(f"Error: Unable to collect the metrics of {', '.join(self.app_names)}, keeping current number of instances.")
+                continue
 
-            app_replicas = status.get(self.app_name).get('instances')
-            if metrics[self.app_name].get("requests_per_second", 0) > 0 and metrics[self.app_name].get("mean_request_time", 0) > 0 and metrics[self.app_name].get("cpu_usage", 0) > 0:
-                app_decision = RLAgentClient(metrics[self.app_name], n_replicas=app_replicas, app_name=self.app_name, base_url=self.rl_agent_url).action()
-                if app_decision is not None:
-                    n_instances_app = app_decision.get("action")
-                else:
-                    n_instances_app = app_replicas
-                    print("RL Agent failed, keeping current number of instances.")
-            else:
-                n_instances_app = app_replicas
-            # Only scale if there's a change needed
-            if n_instances_app != app_replicas:
-                print(f"Scaling {self.app_name} from {app_replicas} to {n_instances_app} instances")
-                self.scale_kubernetes_client.scale_app(self.app_name, n_instances_app)
-                print(f"Scaling {self.app_name} from {app_replicas} to {n_instances_app} instances")
-        
-            # Add current instance data to history
-            history_entry = {
-                "timestamp": datetime.now().isoformat(),
-                "elapsed_seconds": elapsed_seconds,
-                "instances": n_instances_app,
-                "cpu_usage": metrics[self.app_name]["cpu_usage"],
-                "requests_per_second": metrics[self.app_name]["requests_per_second"],
-                "mean_request_time": metrics[self.app_name]["mean_request_time"],
-                "total_arrived_requests": metrics[self.app_name]["total_arrived_requests"],
-                "workload": metrics[self.app_name]["arrival_rate"],
-                "gateway_mean_response_time": metrics[self.app_name]["mean_response_time"]
-            }
-            self.instance_history.append(history_entry)
+            # the decisions of the applications are taken concurrently, so that
+            # a slow RL agent only delays its own application
+            futures = [
+                self.decision_executor.submit(self._run_pipeline, pipeline, tick, elapsed_seconds, metrics, status)
+                for pipeline in self.pipelines.values()
+            ]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error running the decision pipeline: {e}")
 
-            # Write updated history to JSON file
-            try:
-                with open(instance_history_file, 'w') as f:
-                    json.dump({
-                        "app_name": self.app_name,
-                        "history": self.instance_history
-                    }, f, indent=2)
-                print(f"Instance history updated in {instance_history_file}")
-            except Exception as e:
-                print(f"Error writing instance history to file: {e}")
-            time.sleep(self.time_window)
 
+def _per_app(values, app_names, option):
+    """One value for all the applications, or one value per application (None for all if not given)"""
+    if values is None:
+        return [None] * len(app_names)
+    if len(values) == 1:
+        return values * len(app_names)
+    if len(values) != len(app_names):
+        raise SystemExit(f"{option} expects one value or one value per application ({len(app_names)})")
+    return values
 
-if __name__ == "__main__":
+
+def _apps_from_args(args):
+    """(app_name, rl_agent_url, policy) of each application given on the command line"""
+    app_names = args.apps if args.apps else [args.app]
+    rl_agent_ports = _per_app(args.rl_agent_port, app_names, '--rl-agent-port')
+    policies = _per_app(args.policy, app_names, '--policy')
+    # without a port the decisions come from the decision table or the fallback
+    return [
+        (app_name, f"http://localhost:{rl_agent_port}" if rl_agent_port is not None else None, policy)
+        for app_name, rl_agent_port, policy in zip(app_names, rl_agent_ports, policies)
+    ]
+
+
+def _parse_args(argv=None):
     parser = argparse.ArgumentParser(description='Log Agent for monitoring and scaling applications')
-    parser.add_argument('--app', type=str,
-                        help='Application name to monitor')
+    app_group = parser.add_mutually_exclusive_group(required=True)
+    app_group.add_argument('--app', type=str,
+                           help='Application name to monitor')
+    app_group.add_argument('--apps', type=str, nargs='+',
+                           help='Names of the applications to monitor from a single process')
     parser.add_argument('--time-window', type=float,
                         help='Time window in seconds for metrics collection')
-    parser.add_argument('--rl-agent-port', type=int,
-                        help='RL Agent port')
-    args = parser.parse_args()
-    time_window=args.time_window
-    app_name=args.app
-    rl_agent_port=args.rl_agent_port
-    print(f"Starting Log Agent for application: {app_name}")
+    parser.add_argument('--rl-agent-port', type=int, nargs='+',
+                        help='RL Agent port, shared by all the applications or one per application')
+    parser.add_argument('--policy', type=str, nargs='+', default=[None],
+                        help='Policy to use when the RL Agent hosts several policies, shared or one per application')
+    return parser.parse_args(argv)
+
 
-    LogAgent(time_window=time_window, app_name=app_name, rl_agent_url=f"http://localhost:{rl_agent_port}").run()
+if __name__ == "__main__":
+    # stop (e.g., on the SIGTERM of Kubernetes) through the shutdown path of the agent
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    args = _parse_args()
+    time_window=args.time_window
+    apps = _apps_from_args(args)
+    print(f"Starting Log Agent for application(s): {', '.join(app_name for app_name, _, _ in apps)}")
+    LogAgent(time_window=time_window, apps=apps).run()
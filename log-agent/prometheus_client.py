@@ -1,20 +1,25 @@
 import requests
 import time
+from requests.adapters import HTTPAdapter
 from config import CONFIG
 
 class PrometheusClient:
     def __init__(self):
         self.base_url = CONFIG['prometheus']['url']
+        self.timeout = CONFIG['prometheus']['timeout']
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
 
-    def query(self, query_str):
-        """Execute a Prometheus query and return the results"""
+    def query(self, query_str, at=None):
+        """Execute a Prometheus query (at time `at`, now if None) and return the results"""
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/api/v1/query",
                 params={
                     "query": query_str,
-                    "time": time.time()
-                }
+                    "time": at if at is not None else time.time()
+                },
+                timeout=self.timeout
             )
             response.raise_for_status()
             return response.json()
@@ -22,20 +27,84 @@ class PrometheusClient:
             print(f"Error querying Prometheus: {e}")
             return None
 
-    def get_average_cpu_usage(self, application, time_window):
+    def query_by_label(self, query_str, label, at=None):
+        """Samples of the vector returned by a query, keyed by `label`; None on error"""
+        result = self.query(query_str, at)
+        if not result or result.get('status') != 'success':
+            return None
+        values = {}
+        for sample in result.get('data', {}).get('result', []):
+            value = float(sample.get('value', [0, 0])[1])
+            if value == value:  # NaN when no request completed in the window
+                values[sample.get('metric', {}).get(label)] = value
+        return values
+
+    def get_gateway_response_metrics(self, applications, time_window, at=None, quantiles=(50, 90, 95, 99)):
+        """
+        Response time metrics of each application measured by the gateway,
+        from the histograms exposed on its metrics port; None on error.
+        """
+        window = f"{int(time_window)}s"
+        downstreams = "|".join(applications)
+        selector = f'{{downstream=~"{downstreams}"}}'
+        mean = self.query_by_label(
+            f'sum by (downstream) (rate(gateway_downstream_latency_seconds_sum{selector}[{window}])) '
+            f'/ sum by (downstream) (rate(gateway_downstream_latency_seconds_count{selector}[{window}]))',
+            'downstream', at
+        )
+        if mean is None:
+            return None
+        arrived = self.query_by_label(
+            f'sum by (downstream) (increase(gateway_downstream_requests_total{selector}[{window}]))', 'downstream', at
+        ) or {}
+        in_flight = self.query_by_label(
+            f'sum by (downstream) (gateway_downstream_in_flight_requests{selector})', 'downstream', at
+        ) or {}
+        metrics = {
+            application: {
+                'mean_response_time': mean.get(application, 0),
+                'gateway_arrived_requests': arrived.get(application, 0),
+                'gateway_in_flight_requests': in_flight.get(application, 0),
+            }
+            for application in applications
+        }
+        for quantile in quantiles:
+            values = self.query_by_label(
+                f'histogram_quantile({quantile / 100}, sum by (downstream, le) '
+                f'(rate(gateway_downstream_latency_seconds_bucket{selector}[{window}])))',
+                'downstream', at
+            ) or {}
+            for application in applications:
+                metrics[application][f'response_time_p{quantile}'] = values.get(application, 0)
+        return metrics
+
+    def get_average_cpu_usage(self, application, time_window, at=None):
         """Get average CPU usage across all pods"""
-        all_pods = self._get_all_pods_cpu_usage(application, time_window)
-        if not all_pods:
-            return 0
+        return self.get_average_cpu_usage_by_app([application], time_window, at)[application]
 
-        total_usage = sum(pod['usage'] for pod in all_pods)
-        return total_usage / len(all_pods)
+    def get_average_cpu_usage_by_app(self, applications, time_window, at=None):
+        """
+        Get the average CPU usage across the pods of each application, with a
+        single query for all of them. Each pod is assigned to the application
+        with the longest name prefixing the pod name.
+        """
+        all_pods = self._get_all_pods_cpu_usage(applications, time_window, at)
+        pod_usages = {application: [] for application in applications}
+        for pod in all_pods:
+            owners = [application for application in applications if pod['pod'].startswith(application)]
+            if owners:
+                pod_usages[max(owners, key=len)].append(pod['usage'])
 
+        return {
+            application: sum(usages) / len(usages) if usages else 0
+            for application, usages in pod_usages.items()
+        }
 
-    def _get_all_pods_cpu_usage(self, application, time_window):
-        """Get CPU usage for all pods of an application"""
-        query = f'rate(container_cpu_usage_seconds_total{{pod=~"{application}.*"}}[{int(time_window)}s])'
-        result = self.query(query)
+    def _get_all_pods_cpu_usage(self, applications, time_window, at=None):
+        """Get CPU usage for all pods of the applications"""
+        pods = "|".join(f"{application}.*" for application in applications)
+        query = f'rate(container_cpu_usage_seconds_total{{pod=~"{pods}"}}[{int(time_window)}s])'
+        result = self.query(query, at)
         
         if not result or result.get('status') != 'success':
             return []
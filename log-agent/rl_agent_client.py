@@ -1,20 +1,37 @@
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from config import CONFIG
 import numpy as np
 
 class RLAgentClient:
-    def __init__(self, metrics, n_replicas, app_name, base_url):
+    def __init__(self, app_name, base_url, time_window, policy=None, decision_table=None, fallback=None):
         self.base_url = base_url
-        self.metrics = metrics
-        self.n_replicas = n_replicas
+        self.policy = policy
+        self.decision_table = decision_table
+        self.local_decisions = CONFIG['rl_agent']['decision_table']['local']
+        self.fallback = fallback
+        self.metrics = {}
+        self.n_replicas = None
+        self.last_decision = None
         self.max_n_replicas = CONFIG['rl_agent']['max_n_replicas']
         self.response_time_threshold = CONFIG['rl_agent']['response_time_threshold'][app_name]
         self.pressure_clip_value = CONFIG['rl_agent']['pressure_clip_value']
         self.queue_length_dominant_clip_value = CONFIG['rl_agent']['queue_length_dominant_clip_value']
         self.demand = CONFIG['rl_agent']['demand'][app_name]
         self.max_workload = CONFIG['rl_agent']['max_workload']
+        self.response_time_statistic = CONFIG['rl_agent']['response_time_statistic']
+        # Every decision (retries included) must be taken within a fraction of
+        # the control period, so that a slow agent cannot stall the loop
+        self.deadline = CONFIG['rl_agent']['decision_deadline_fraction'] * time_window
+        self.max_retries = CONFIG['rl_agent']['max_retries']
+        # Persistent session: the connection to the agent is reused across ticks
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
 
-    def action(self):
+    def action(self, metrics, n_replicas):
+        self.metrics = metrics
+        self.n_replicas = n_replicas
         observation = {
             "n_instances": self._normalized_n_replicas(),
             "workload": self._normalized_workload(),
@@ -22,18 +39,46 @@ class RLAgentClient:
             "pressure": self._normalized_pressure(),
             "queue_length_dominant": self._normalized_queue_length_dominant(),
         }
-        try:
-            print('CALLING ACTION WITH: ', observation)
-            response = requests.post(
-                f"{self.base_url}/action",
-                json={'observation': observation}
-            )
+        if self.decision_table is not None and self.local_decisions:
+            return self.decision_table.action(observation)
+
+        decision = self._request_action(observation)
+        if decision is not None:
+            self.last_decision = decision.get("action")
+            return decision
+        if self.fallback is not None:
+            decision = self.fallback.action(observation, self.metrics, self.n_replicas, self.last_decision)
+            print(f"Using {type(self.fallback).__name__} decision: {decision}")
+        return decision
 
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"Error calling RL Agent: {e}")
+    def _request_action(self, observation):
+        if self.base_url is None:
+            print("Error calling RL Agent: no RL agent port given")
             return None
+        payload = {'observation': observation}
+        if self.policy is not None:
+            payload['policy'] = self.policy
+        print('CALLING ACTION WITH: ', observation)
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(1 + self.max_retries):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print("Error calling RL Agent: decision deadline exceeded")
+                return None
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/action",
+                    json=payload,
+                    timeout=remaining
+                )
+                response.raise_for_status()
+                return response.json()
+            except Exception as e:
+                print(f"Error calling RL Agent (attempt {attempt + 1}/{1 + self.max_retries}): {e}")
+        return None
+
+    def close(self):
+        self.session.close()
 
     def _normalized_n_replicas(self):
         return self.n_replicas / self.max_n_replicas
@@ -70,4 +115,5 @@ class RLAgentClient:
         return self.demand
 
     def _response_time(self):
-        return self.metrics["mean_response_time"]
+        # the mean is used when the percentile is not available (e.g., no sample yet)
+        return self.metrics.get(self.response_time_statistic, self.metrics["mean_response_time"])
@@ -1,9 +1,13 @@
 import requests
+from requests.adapters import HTTPAdapter
 from config import CONFIG
 
 class ScaleKubernetesClient:
     def __init__(self):
         self.base_url = CONFIG.get('scale_kubernetes').get('url')
+        self.timeout = CONFIG.get('scale_kubernetes').get('timeout')
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
 
     def scale_app(self, app_name, n_instances):
         """
@@ -17,12 +21,13 @@ class ScaleKubernetesClient:
             dict: The response from the gateway API
         """
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/scale",
                 json={
                     "app": app_name,
                     "instances": n_instances
-                }
+                },
+                timeout=self.timeout
             )
             response.raise_for_status()
             return response.json()
@@ -38,7 +43,7 @@ class ScaleKubernetesClient:
             dict: The current scaling status
         """
         try:
-            response = requests.get(f"{self.base_url}/scale-status")
+            response = self.session.get(f"{self.base_url}/scale-status", timeout=self.timeout)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -53,7 +58,7 @@ class ScaleKubernetesClient:
             bool: True if the gateway is healthy, False otherwise
         """
         try:
-            response = requests.get(f"{self.base_url}/")
+            response = self.session.get(f"{self.base_url}/", timeout=self.timeout)
             return response.status_code == 200
         except Exception:
             return False
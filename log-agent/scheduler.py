@@ -0,0 +1,74 @@
+import math
+import time
+
+
+class Tick:
+    def __init__(self, index: int, window_start: float, window_end: float, lag: float, skipped: int,
+                 previous_overrun: float = 0.0):
+        self.index = index
+        # the metrics of the tick are collected over [window_start, window_end]
+        self.window_start = window_start
+        self.window_end = window_end
+        # seconds between the scheduled and the actual start of the tick
+        self.lag = lag
+        # ticks skipped (or coalesced into this one) because of an overrun
+        self.skipped = skipped
+        self.started_at = time.time()
+        # seconds by which the previous tick overran the period, known only
+        # once it has completed, hence recorded with this tick
+        self.previous_overrun = previous_overrun
+        self.overrun = 0.0
+
+    @property
+    def window_length(self) -> float:
+        return self.window_end - self.window_start
+
+
+class FixedRateScheduler:
+    """
+    Fire a tick at every wall-clock multiple of `period` (plus `delay`, which
+    lets the last log entries of the window be ingested), regardless of how
+    long the previous tick took.
+
+    When a tick overruns and boundaries are missed, the `skip` policy moves
+    on to the latest window only, while `coalesce` makes the next tick cover
+    all the missed windows at once.
+    """
+    def __init__(self, period: float, delay: float = 0.0, overload_policy: str = "skip"):
+        if overload_policy not in ("skip", "coalesce"):
+            raise ValueError(f"Unknown overload policy '{overload_policy}', expected 'skip' or 'coalesce'")
+        self.period = period
+        self.delay = delay
+        self.overload_policy = overload_policy
+        self.total_skipped = 0
+        self.last_overrun = 0.0
+
+    def ticks(self):
+        index = 0
+        window_end = (math.floor(time.time() / self.period) + 1) * self.period
+        window_start = window_end - self.period
+        while True:
+            scheduled = window_end + self.delay
+            wait = scheduled - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            now = time.time()
+            lag = now - scheduled
+
+            # aligned windows that closed while the previous tick was running
+            skipped = max(math.floor(lag / self.period), 0)
+            if skipped > 0:
+                window_end += skipped * self.period
+                if self.overload_policy == "skip":
+                    window_start = window_end - self.period
+                self.total_skipped += skipped
+                print(f"Warning: tick {index} is {lag:.3f} seconds late, {skipped} tick(s) {'skipped' if self.overload_policy == 'skip' else 'coalesced'}.")
+
+            tick = Tick(index, window_start, window_end, lag, skipped, previous_overrun=self.last_overrun)
+            yield tick
+
+            tick.overrun = self.last_overrun = max(time.time() - tick.started_at - self.period, 0.0)
+            if tick.overrun > 0:
+                print(f"Warning: tick {index} overran the period by {tick.overrun:.3f} seconds.")
+            index += 1
+            window_start, window_end = window_end, window_end + self.period
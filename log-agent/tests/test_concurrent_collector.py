@@ -0,0 +1,27 @@
+import threading
+import time
+
+from concurrent_collector import ConcurrentCollector, SharedQuery
+
+
+def test_shared_query_runs_once_for_concurrent_sources():
+    calls = []
+
+    def query():
+        calls.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return {'flask-app-1': 0.5}
+
+    shared = SharedQuery(query)
+    collector = ConcurrentCollector({'app_logs': 1, 'gateway_metrics': 1})
+    results = collector.collect({'app_logs': shared.result, 'gateway_metrics': shared.result})
+    assert results == {'app_logs': {'flask-app-1': 0.5}, 'gateway_metrics': {'flask-app-1': 0.5}}
+    assert len(calls) == 1
+
+
+def test_shared_query_shares_a_failed_result():
+    calls = []
+    shared = SharedQuery(lambda: calls.append(1))
+    assert shared.result() is None
+    assert shared.result() is None
+    assert len(calls) == 1
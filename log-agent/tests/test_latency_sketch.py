@@ -0,0 +1,42 @@
+import random
+
+from latency_sketch import LatencySketch
+
+
+def exact_quantile(values, q):
+    return sorted(values)[int(q * (len(values) - 1))]
+
+
+def test_quantiles_within_relative_accuracy():
+    rng = random.Random(0)
+    values = [rng.lognormvariate(-1, 1) for _ in range(10000)]
+    sketch = LatencySketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    for q in (0.5, 0.9, 0.99):
+        assert abs(sketch.quantile(q) - exact_quantile(values, q)) <= 0.011 * exact_quantile(values, q)
+
+
+def test_collapse_keeps_the_high_quantiles_and_the_bucket_bound():
+    rng = random.Random(1)
+    values = [rng.uniform(1e-4, 100) for _ in range(5000)]
+    sketch = LatencySketch(relative_accuracy=0.01, max_buckets=64)
+    for value in values:
+        sketch.add(value)
+    assert len(sketch.buckets) == len(sketch.indices) == 64
+    assert sorted(sketch.indices) == sorted(sketch.buckets)
+    assert sum(sketch.buckets.values()) == len(values)
+    assert abs(sketch.quantile(0.99) - exact_quantile(values, 0.99)) <= 0.011 * exact_quantile(values, 0.99)
+
+
+def test_merge_matches_a_single_sketch():
+    rng = random.Random(2)
+    values = [rng.expovariate(2) for _ in range(4000)]
+    single, first, second = LatencySketch(max_buckets=128), LatencySketch(max_buckets=128), LatencySketch(max_buckets=128)
+    for i, value in enumerate(values):
+        single.add(value)
+        (first if i % 2 else second).add(value)
+    first.merge(second)
+    assert first.count == single.count
+    assert sorted(first.indices) == sorted(first.buckets)
+    assert abs(first.quantile(0.95) - single.quantile(0.95)) <= 0.02 * single.quantile(0.95)
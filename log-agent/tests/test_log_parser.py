@@ -0,0 +1,18 @@
+from log_parser import ARRIVED, COMPLETED, RESPONSE_TIME, parse_entries
+
+PREFIX = "2025-01-01 10:00:00,000 - werkzeug - INFO - "
+
+
+def test_entries_are_classified_in_one_pass():
+    entries = [
+        (1, PREFIX + "ID: 12 request arrived", "app"),
+        (2, PREFIX + "GET / HTTP/1.1 200", "app"),
+        (3, PREFIX + "ID: 12 request completed with status 200.%", "app"),
+        (4, PREFIX + "ID: 12 | flask-app-1 response time: 0.53 seconds", "gateway"),
+        (5, PREFIX + "ID: 13 | flask-app-1 response time: 1e-2e seconds", "gateway"),
+    ]
+    assert list(parse_entries(entries)) == [
+        (1, 12, ARRIVED, None, None, "app"),
+        (3, 12, COMPLETED, None, None, "app"),
+        (4, 12, RESPONSE_TIME, "flask-app-1", 0.53, "gateway"),
+    ]
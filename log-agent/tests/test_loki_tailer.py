@@ -0,0 +1,60 @@
+from loki_tailer import LokiTailer
+
+STREAM = {'application': 'flask-app-1', 'logger': 'app', 'level': 'INFO'}
+
+
+class FakeLokiClient:
+    """Entries (timestamp [ns], message, stream) visible in Loki, as ingested so far"""
+    def __init__(self):
+        self.entries = []
+
+    def push(self, seconds, message, stream=STREAM):
+        self.entries.append((int(seconds * 1e9), message, stream))
+
+    def iter_logs(self, query, start, end):
+        return iter(sorted(e for e in self.entries if start <= e[0] <= end))
+
+
+def messages(tailer, end):
+    return [message for _, message, _ in tailer.poll(end=end)]
+
+
+def test_poll_returns_each_entry_once():
+    client = FakeLokiClient()
+    tailer = LokiTailer(client, '{application="flask-app-1"}', initial_lookback=10, overlap=5)
+    client.push(1, 'a')
+    client.push(2, 'b')
+    assert messages(tailer, end=3) == ['a', 'b']
+    client.push(4, 'c')
+    assert messages(tailer, end=5) == ['c']
+    assert messages(tailer, end=6) == []
+
+
+def test_late_entry_older_than_the_last_one_seen_is_returned():
+    client = FakeLokiClient()
+    tailer = LokiTailer(client, '{application="flask-app-1"}', initial_lookback=10, overlap=5)
+    client.push(9.5, 'pod-1')
+    assert messages(tailer, end=10) == ['pod-1']
+    # a line of another pod, in the same stream, ingested after the poll
+    client.push(8, 'pod-2')
+    assert messages(tailer, end=11) == ['pod-2']
+    assert messages(tailer, end=12) == []
+
+
+def test_identical_lines_at_different_timestamps_are_kept():
+    client = FakeLokiClient()
+    tailer = LokiTailer(client, '{application="flask-app-1"}', initial_lookback=10, overlap=5)
+    client.push(1, 'same')
+    client.push(1, 'other')
+    assert sorted(messages(tailer, end=2)) == ['other', 'same']
+    client.push(1.5, 'same')
+    assert messages(tailer, end=3) == ['same']
+
+
+def test_seen_entries_are_bounded_by_the_overlap():
+    client = FakeLokiClient()
+    tailer = LokiTailer(client, '{application="flask-app-1"}', initial_lookback=10, overlap=5)
+    for second in range(100):
+        client.push(second, f'line {second}')
+        list(tailer.poll(end=second + 0.5))
+    assert sum(len(seen) for seen in tailer.seen.values()) <= 6
@@ -0,0 +1,29 @@
+import pytest
+
+from main import _apps_from_args, _parse_args
+
+
+def apps(command_line):
+    return _apps_from_args(_parse_args(command_line.split()))
+
+
+def test_single_app_without_rl_agent_port():
+    assert apps("--app flask-app-1 --time-window 5") == [("flask-app-1", None, None)]
+
+
+def test_shared_port_and_policy_per_app():
+    assert apps("--apps flask-app-1 flask-app-2 --rl-agent-port 5003 --policy p1 p2") == [
+        ("flask-app-1", "http://localhost:5003", "p1"),
+        ("flask-app-2", "http://localhost:5003", "p2"),
+    ]
+
+
+def test_port_per_app():
+    assert [url for _, url, _ in apps("--apps flask-app-1 flask-app-2 --rl-agent-port 5001 5002")] == [
+        "http://localhost:5001", "http://localhost:5002"
+    ]
+
+
+def test_wrong_number_of_ports_is_rejected():
+    with pytest.raises(SystemExit):
+        apps("--apps flask-app-1 flask-app-2 --rl-agent-port 5001 5002 5003")
@@ -0,0 +1,78 @@
+"""The observation built by the log agent is the one the RL agent policies read."""
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+from decision_table import DecisionTable
+from fallback_policies import DecisionTableFallback
+from rl_agent_client import RLAgentClient
+
+AGENT_OBSERVATION = os.path.join(
+    os.path.dirname(__file__), "..", "..", "agent", "src", "production_agents", "DQN", "observation.py"
+)
+METRICS = {
+    "cpu_usage": 0.4,
+    "requests_per_second": 1.5,
+    "arrival_rate": 1.6,
+    "mean_response_time": 0.9,
+    "total_arrived_requests": 90,
+    "pending_replicas": 2,
+    "shed_requests": 10,
+}
+
+
+@pytest.fixture(scope="module")
+def agent_observation():
+    spec = importlib.util.spec_from_file_location("agent_observation", AGENT_OBSERVATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def table(keys, table_class=DecisionTable):
+    axes = [np.linspace(0, 1, 3) for _ in keys]
+    return table_class(np.ones([3] * len(keys), dtype=np.int8), keys, axes)
+
+
+def sent_observation(keys):
+    """Observation sent by the client, as received by a decision table with `keys`"""
+    received = []
+
+    class RecordingTable(DecisionTable):
+        def action(self, observation):
+            received.append(observation)
+            return super().action(observation)
+
+    fallback = DecisionTableFallback(table(keys, RecordingTable))
+    client = RLAgentClient("flask-app-1", None, time_window=60, fallback=fallback)
+    assert client.action(dict(METRICS), n_replicas=2) == {"action": 1}
+    return received[0]
+
+
+def test_client_observation_has_the_keys_of_the_policy(agent_observation):
+    observation = sent_observation(agent_observation.OBS_KEYS)
+    assert sorted(observation) == sorted(agent_observation.OBS_KEYS)
+    agent_observation.check_observation_keys(observation)
+    arrays = agent_observation.observation_for_agent(observation)
+    assert list(arrays) == agent_observation.OBS_KEYS
+
+
+def test_agent_ignores_keys_the_policy_does_not_read(agent_observation):
+    observation = sent_observation(agent_observation.OBS_KEYS)
+    arrays = agent_observation.observation_for_agent({**observation, "pending_replicas": 0.2})
+    assert list(arrays) == agent_observation.OBS_KEYS
+    assert agent_observation.stack_observations([{**observation, "shed_fraction": 0.1}]).shape == (1, 5)
+
+
+def test_agent_rejects_missing_keys(agent_observation):
+    observation = sent_observation(agent_observation.OBS_KEYS)
+    with pytest.raises(ValueError, match="workload"):
+        agent_observation.stack_observations([{k: v for k, v in observation.items() if k != "workload"}])
+
+
+def test_decision_table_rejects_keys_it_does_not_read(agent_observation):
+    observation = sent_observation(agent_observation.OBS_KEYS)
+    with pytest.raises(ValueError, match="shed_fraction"):
+        table(agent_observation.OBS_KEYS).action({**observation, "shed_fraction": 0.1})
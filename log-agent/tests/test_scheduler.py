@@ -0,0 +1,23 @@
+import time
+
+import pytest
+
+from scheduler import FixedRateScheduler
+
+
+def test_overrun_of_a_tick_is_recorded_with_the_next_one():
+    scheduler = FixedRateScheduler(period=0.1, overload_policy="skip")
+    ticks = scheduler.ticks()
+    first = next(ticks)
+    assert first.previous_overrun == 0.0
+    time.sleep(0.15)
+    second = next(ticks)
+    assert first.overrun > 0
+    assert second.previous_overrun == first.overrun
+    third = next(ticks)
+    assert third.previous_overrun == second.overrun == 0.0
+
+
+def test_unknown_overload_policy_is_rejected():
+    with pytest.raises(ValueError):
+        FixedRateScheduler(period=1, overload_policy="queue")
@@ -0,0 +1,37 @@
+"""Stopping the agent syncs the instance histories and closes the RL agent connections."""
+import json
+
+import pytest
+
+from main import LogAgent
+
+
+class StopAfter:
+    """Scheduler of the test: no tick, then the agent is stopped"""
+    def __init__(self, error):
+        self.error = error
+
+    def ticks(self):
+        raise self.error
+        yield
+
+
+@pytest.mark.parametrize("error", [KeyboardInterrupt(), SystemExit(0)])
+def test_run_closes_the_pipelines_on_shutdown(tmp_path, monkeypatch, error):
+    monkeypatch.chdir(tmp_path)
+    agent = LogAgent(time_window=60, apps=[("flask-app-1", None, None), ("flask-app-2", None, None)])
+    synced = []
+    for pipeline in agent.pipelines.values():
+        pipeline.history_sink.append({"app_name": pipeline.app_name})
+        monkeypatch.setattr(pipeline.history_sink, "sync",
+                            lambda sink=pipeline.history_sink: synced.append(sink.path))
+    agent.scheduler = StopAfter(error)
+
+    with pytest.raises(type(error)):
+        agent.run()
+
+    assert sorted(synced) == ["flask-app-1_instance_history.jsonl", "flask-app-2_instance_history.jsonl"]
+    for pipeline in agent.pipelines.values():
+        assert pipeline.history_sink.file.closed
+        with open(tmp_path / pipeline.instance_history_file) as f:
+            assert json.loads(f.readline()) == {"app_name": pipeline.app_name}